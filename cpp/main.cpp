@@ -27,7 +27,31 @@ int main(int argc, char **argv)
 {
     if (argc < 3)
     {
-        std::cout << "usage: <grammar-file> <string-file>" << std::endl;
+        std::cout << "usage: <grammar-file> <string-file> [bitset]" << std::endl;
+        return 0;
+    }
+
+    // a grammar compiled by python -m mincfg -c is mapped into memory rather than read
+    if (is_compiled_grammar(argv[1]))
+    {
+        compiled_grammar_t grammar;
+        if (!load_grammar(argv[1], grammar))
+        {
+            std::cout << "bad grammar file: " << argv[1] << std::endl;
+            return -1;
+        }
+        auto ifs2 = open_file(argv[2]);
+        if (ifs2 == nullptr)
+        {
+            return -1;
+        }
+        std::stringstream ss;
+        ss << ifs2->rdbuf();
+
+        std::vector<std::size_t> x;
+        bool lexing = (grammar.flags & compiled_grammar_t::flag_lexing) != 0;
+        bool ok = tokenize(ss.str(), grammar, lexing, x) && is_match_compiled(x, grammar);
+        std::cout << (ok ? "Yes" : "No") << std::endl;
         return 0;
     }
 
@@ -59,7 +83,9 @@ int main(int argc, char **argv)
     std::stringstream ss;
     ss << ifs2->rdbuf();
 
-    std::cout << (is_match(ss.str(), rules) ? "Yes" : "No") << std::endl;
+    bool bitset = argc > 3 && std::strcmp(argv[3], "bitset") == 0;
+    bool ok = bitset ? is_match_bitset(ss.str(), rules) : is_match(ss.str(), rules);
+    std::cout << (ok ? "Yes" : "No") << std::endl;
 
     return 0;
 }
@@ -1,10 +1,30 @@
 
+#include <cstdint>
+#include <cstring>
 #include <vector>
+#include <unordered_map>
 #include <unordered_set>
 #include <string>
 
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
 // #include <iostream>
 
+// offsets of the rows of a span-major upper-triangular chart for a string of length n:
+// the cell of substring str[i..j] is at rows[j - i] + i, and the whole string is the last cell
+inline std::vector<std::size_t> chart_rows(std::size_t n)
+{
+    std::vector<std::size_t> rows(n);
+    for (std::size_t s = 0; s < n; ++s)
+    {
+        rows[s] = s * n - s * (s - 1) / 2;
+    }
+    return rows;
+}
+
 struct rule_t
 {
     int nt{0};
@@ -20,48 +40,339 @@ bool is_match(const std::string &str, const std::vector<rule_t> &rules)
         return false;
     }
 
-    std::vector<std::vector<std::unordered_set<int>>> M;
-    M.resize(n);
-    for (auto &row : M)
+    // span-major upper triangle: cell (i, j) lives at M[rows[j - i] + i]
+    auto rows = chart_rows(n);
+    std::vector<std::unordered_set<int>> M(n * (n + 1) / 2);
+
+    for (std::size_t i = 0; i < n; ++i)
+    {
+        M[i].insert(str[i]);
+    }
+
+    for (std::size_t s = 1; s < n; ++s)
+    {
+        for (std::size_t i = 0; i < n - s; ++i)
+        {
+            auto &cell = M[rows[s] + i];
+            for (std::size_t k = i; k < i + s; ++k)
+            {
+                const auto &left = M[rows[k - i] + i];
+                const auto &right = M[rows[i + s - k - 1] + k + 1];
+                for (const auto &rule : rules)
+                {
+                    if (left.find(rule.t_left) != left.end() && right.find(rule.t_right) != right.end())
+                    {
+                        cell.insert(rule.nt);
+                    }
+                }
+            }
+        }
+    }
+
+    return M.back().find(-1) != M.back().end();
+}
+
+// same as is_match, but symbols are interned to dense ids and every chart cell is a bitset
+bool is_match_bitset(const std::string &str, const std::vector<rule_t> &rules)
+{
+    auto n = str.length();
+    if (n < 2)
+    {
+        return false;
+    }
+
+    // the starting -1 is numbered 0
+    std::unordered_map<int, std::size_t> ids{{-1, 0}};
+    auto intern = [&ids](int symbol) {
+        return ids.emplace(symbol, ids.size()).first->second;
+    };
+    struct pair_t
+    {
+        std::size_t right;
+        std::size_t head;
+    };
+    std::vector<std::vector<pair_t>> by_left;
+    for (const auto &rule : rules)
     {
-        row.resize(n);
+        auto a = intern(rule.nt);
+        auto b = intern(rule.t_left);
+        auto c = intern(rule.t_right);
+        if (by_left.size() < ids.size())
+        {
+            by_left.resize(ids.size());
+        }
+        by_left[b].push_back({c, a});
     }
+    by_left.resize(ids.size());
+
+    auto words = (ids.size() + 63) / 64;
+    auto test = [](const std::uint64_t *cell, std::size_t bit) {
+        return (cell[bit / 64] >> (bit % 64)) & 1;
+    };
+
+    // span-major upper triangle: cell (i, j) lives at M[(rows[j - i] + i) * words]
+    auto rows = chart_rows(n);
+    std::vector<std::uint64_t> M(n * (n + 1) / 2 * words, 0);
+    auto cell = [&](std::size_t i, std::size_t j) {
+        return &M[(rows[j - i] + i) * words];
+    };
 
     for (std::size_t i = 0; i < n; ++i)
     {
-        M[i][i].insert(str[i]);
+        auto it = ids.find(static_cast<unsigned char>(str[i]));
+        if (it != ids.end())
+        {
+            cell(i, i)[it->second / 64] |= std::uint64_t{1} << (it->second % 64);
+        }
     }
 
     for (std::size_t s = 1; s < n; ++s)
     {
         for (std::size_t i = 0; i < n - s; ++i)
         {
+            auto out = cell(i, i + s);
             for (std::size_t k = i; k < i + s; ++k)
             {
-                for (const auto &rule : rules)
+                auto left = cell(i, k);
+                auto right = cell(k + 1, i + s);
+                for (std::size_t w = 0; w < words; ++w)
                 {
-                    if (M[i][k].find(rule.t_left) != M[i][k].end() && M[k + 1][i + s].find(rule.t_right) != M[k + 1][i + s].end())
+                    for (auto bits = left[w]; bits; bits &= bits - 1)
                     {
-                        M[i][i + s].insert(rule.nt);
+                        auto b = w * 64 + __builtin_ctzll(bits);
+                        for (const auto &pair : by_left[b])
+                        {
+                            if (test(right, pair.right))
+                            {
+                                out[pair.head / 64] |= std::uint64_t{1} << (pair.head % 64);
+                            }
+                        }
                     }
                 }
             }
         }
-        // std::cout << "loop s = " << s << std::endl;
-    }
-
-    // for (std::size_t i = 0; i < n; ++i)
-    // {
-    //     for (std::size_t j = 0; j < n; ++j)
-    //     {
-    //         printf("M[%d][%d] = {", i, j);
-    //         for (const auto &e : M[i][j])
-    //         {
-    //             std::cout << e << ", ";
-    //         }
-    //         std::cout << "}" << std::endl;
-    //     }
-    // }
-
-    return M[0][n - 1].find(-1) != M[0][n - 1].end();
+    }
+
+    return test(cell(0, n - 1), 0);
+}
+
+// a grammar file written by mincfg's binary.dump, mapped into memory read-only;
+// see mincfg/binary.py for the layout, read here as is on a little-endian host
+struct compiled_grammar_t
+{
+    static constexpr std::uint32_t version = 1;
+    static constexpr std::uint32_t flag_lexing = 1;
+    static constexpr std::uint32_t flag_accepts_empty = 2;
+
+    const char *data{nullptr};
+    std::size_t size{0};
+    std::uint32_t flags{0};
+    std::uint32_t n_nonterminals{0};
+    std::uint32_t n_terminals{0};
+    std::uint32_t n_rules{0};
+    std::uint32_t n_singles{0};
+    const std::uint32_t *terminals{nullptr};
+    const std::uint32_t *left_offsets{nullptr};
+    const std::uint32_t *rules{nullptr};
+    const std::uint32_t *singles{nullptr};
+    const char *strings{nullptr};
+
+    compiled_grammar_t() = default;
+    compiled_grammar_t(const compiled_grammar_t &) = delete;
+    compiled_grammar_t &operator=(const compiled_grammar_t &) = delete;
+
+    ~compiled_grammar_t()
+    {
+        if (data != nullptr)
+        {
+            munmap(const_cast<char *>(data), size);
+        }
+    }
+
+    std::size_t n_symbols() const
+    {
+        return n_nonterminals + n_terminals;
+    }
+
+    // the text of the terminal of id n_nonterminals + t
+    std::string terminal(std::size_t t) const
+    {
+        return std::string(strings + terminals[2 * t], terminals[2 * t + 1]);
+    }
+};
+
+inline bool is_compiled_grammar(const char *path)
+{
+    char magic[8] = {0};
+    auto fd = open(path, O_RDONLY);
+    if (fd < 0)
+    {
+        return false;
+    }
+    auto got = read(fd, magic, sizeof(magic));
+    close(fd);
+    return got == sizeof(magic) && std::memcmp(magic, "MINCFGB\0", 8) == 0;
+}
+
+// map the grammar file at path into g; false if it cannot be read or is not a compiled grammar of this version
+inline bool load_grammar(const char *path, compiled_grammar_t &g)
+{
+    auto fd = open(path, O_RDONLY);
+    if (fd < 0)
+    {
+        return false;
+    }
+    struct stat st;
+    if (fstat(fd, &st) != 0 || st.st_size < 40)
+    {
+        close(fd);
+        return false;
+    }
+    auto mapped = mmap(nullptr, st.st_size, PROT_READ, MAP_SHARED, fd, 0);
+    close(fd);
+    if (mapped == MAP_FAILED)
+    {
+        return false;
+    }
+    g.data = static_cast<const char *>(mapped);
+    g.size = st.st_size;
+
+    std::uint32_t header[8];
+    std::memcpy(header, g.data + 8, sizeof(header));
+    if (std::memcmp(g.data, "MINCFGB\0", 8) != 0 || header[0] != compiled_grammar_t::version)
+    {
+        return false;
+    }
+    g.flags = header[1];
+    g.n_nonterminals = header[2];
+    g.n_terminals = header[3];
+    g.n_rules = header[4];
+    g.n_singles = header[5];
+    auto n_strings = header[6];
+
+    auto words = reinterpret_cast<const std::uint32_t *>(g.data + 40);
+    // the nonterminal numbers are not needed to match
+    words += g.n_nonterminals;
+    g.terminals = words;
+    words += 2 * g.n_terminals;
+    g.left_offsets = words;
+    words += g.n_symbols() + 1;
+    g.rules = words;
+    words += 3 * g.n_rules;
+    g.singles = words;
+    words += g.n_singles;
+    g.strings = reinterpret_cast<const char *>(words);
+    return g.strings + n_strings <= g.data + g.size;
+}
+
+// break str down into terminal ids by longest match, skipping whitespace between tokens if lexing;
+// false if some part of str is no terminal
+inline bool tokenize(const std::string &str, const compiled_grammar_t &g, bool lexing, std::vector<std::size_t> &out)
+{
+    // the terminals by their first byte
+    std::vector<std::vector<std::size_t>> by_first(256);
+    for (std::size_t t = 0; t < g.n_terminals; ++t)
+    {
+        if (g.terminals[2 * t + 1] > 0)
+        {
+            by_first[static_cast<unsigned char>(g.strings[g.terminals[2 * t]])].push_back(t);
+        }
+    }
+
+    std::size_t i = 0;
+    while (i < str.length())
+    {
+        if (lexing && std::strchr(" \t\n\r\x0b\x0c", str[i]) != nullptr)
+        {
+            ++i;
+            continue;
+        }
+        std::size_t best = 0;
+        std::size_t best_length = 0;
+        for (auto t : by_first[static_cast<unsigned char>(str[i])])
+        {
+            auto length = g.terminals[2 * t + 1];
+            if (length > best_length && str.compare(i, length, g.strings + g.terminals[2 * t], length) == 0)
+            {
+                best = t;
+                best_length = length;
+            }
+        }
+        if (best_length == 0)
+        {
+            return false;
+        }
+        out.push_back(g.n_nonterminals + best);
+        i += best_length;
+    }
+    return true;
+}
+
+// same as is_match_bitset, but on the symbol ids of a compiled grammar, reading its rules in place
+bool is_match_compiled(const std::vector<std::size_t> &x, const compiled_grammar_t &g)
+{
+    auto n = x.size();
+    if (n == 0)
+    {
+        return (g.flags & compiled_grammar_t::flag_accepts_empty) != 0;
+    }
+    if (n == 1)
+    {
+        for (std::uint32_t i = 0; i < g.n_singles; ++i)
+        {
+            if (g.singles[i] == x[0])
+            {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    auto words = (g.n_symbols() + 63) / 64;
+    auto test = [](const std::uint64_t *cell, std::size_t bit) {
+        return (cell[bit / 64] >> (bit % 64)) & 1;
+    };
+
+    auto rows = chart_rows(n);
+    std::vector<std::uint64_t> M(n * (n + 1) / 2 * words, 0);
+    auto cell = [&](std::size_t i, std::size_t j) {
+        return &M[(rows[j - i] + i) * words];
+    };
+
+    for (std::size_t i = 0; i < n; ++i)
+    {
+        cell(i, i)[x[i] / 64] |= std::uint64_t{1} << (x[i] % 64);
+    }
+
+    for (std::size_t s = 1; s < n; ++s)
+    {
+        for (std::size_t i = 0; i < n - s; ++i)
+        {
+            auto out = cell(i, i + s);
+            for (std::size_t k = i; k < i + s; ++k)
+            {
+                auto left = cell(i, k);
+                auto right = cell(k + 1, i + s);
+                for (std::size_t w = 0; w < words; ++w)
+                {
+                    for (auto bits = left[w]; bits; bits &= bits - 1)
+                    {
+                        auto b = w * 64 + __builtin_ctzll(bits);
+                        // the rules are sorted by left symbol, then right symbol
+                        for (auto r = g.left_offsets[b]; r < g.left_offsets[b + 1]; ++r)
+                        {
+                            auto rule = g.rules + 3 * r;
+                            if (test(right, rule[1]))
+                            {
+                                out[rule[2] / 64] |= std::uint64_t{1} << (rule[2] % 64);
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    // the starting -1 is numbered 0
+    return test(cell(0, n - 1), 0);
 }
@@ -1,2 +1,3 @@
 
 from .mincfg import *
+from . import cache
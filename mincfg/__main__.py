@@ -1,25 +1,196 @@
 
 import argparse
+import json
+import mmap
+import os
+import random
+import sys
+import time
 
+from . import cache
 from . import mincfg
 
 
+def profile_grammar(cfg, lexing, top=10):
+    G_cnf, passes, sources = mincfg.profile_cnf(mincfg.parse(cfg, lexing), top)
+    print(f"{'pass':<24} {'rules':>7} {'non-terminals':>14} {'time (s)':>9}")
+    for record in passes:
+        print(f"{record['pass']:<24} {record['rules']:>7} {record['non_terminals']:>14} {record['seconds']:>9.4f}")
+    print()
+    print(f"{'non-terminal':>12} {'cnf rules':>10} {'share':>6}")
+    for nt, count in sources:
+        print(f"{nt:>12} {count:>10} {count / len(G_cnf):>6.1%}")
+
+
+def strip_newline(line):
+    if line.endswith(b"\n"):
+        line = line[:-1]
+    if line.endswith(b"\r"):
+        line = line[:-1]
+    return line
+
+
+def read_records(fd, chunk_size=1 << 20):
+    '''
+    iterate over the lines of binary file `fd`, as bytes without their line endings, reading `chunk_size` bytes at a time.
+    '''
+    rest = b""
+    while True:
+        chunk = fd.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield strip_newline(line)
+    if rest:
+        yield strip_newline(rest)
+
+
+def map_records(path):
+    '''
+    iterate over the lines of the file at `path`, as bytes without their line endings, the file mapped into memory.
+    '''
+    with open(path, 'rb') as fd:
+        if os.fstat(fd.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            yield from map(strip_newline, iter(mapping.readline, b""))
+
+
+def run_batch(recognizer, records, out, workers=1, chunksize=64):
+    '''
+    match every record of `records`, UTF-8 bytes, writing to `out` one JSON line {"record": i, "match": ...}
+    per record, numbered from 1, then a summary line; return the summary.
+    a record that is not UTF-8, or that `recognizer` fails on, such as one it cannot lex, does not match,
+    and its line has the "error" too; the summary counts these among the rejected, and apart.
+    with `workers` above 1, the records are matched by a pool of processes; see `CFLRecognizer.match_many`.
+    the early rejections of `recognizer.shortcuts` are only counted when matching in this process.
+    '''
+    # key: number of a record that is not UTF-8; value: the error
+    undecodable = {}
+
+    def decoded():
+        for i, record in enumerate(records, 1):
+            try:
+                yield record.decode()
+            except UnicodeDecodeError as e:
+                undecodable[i] = str(e)
+
+    def verdict(i, result):
+        if type(result) is bool:
+            return {"record": i, "match": result}
+        return {"record": i, "match": False, "error": result}
+
+    def write(line):
+        nonlocal matched, failed
+        matched += line["match"]
+        failed += "error" in line
+        out.write(json.dumps(line) + "\n")
+
+    shortcuts = dict(recognizer.shortcuts)
+    matched = 0
+    failed = 0
+    total = 0
+    start = time.perf_counter()
+    # the records not decoded are skipped by match_many, and filled in by number
+    for result in recognizer.match_many(decoded(), workers, chunksize, errors=True):
+        total += 1
+        while total in undecodable:
+            write(verdict(total, undecodable.pop(total)))
+            total += 1
+        write(verdict(total, result))
+    while total + 1 in undecodable:
+        total += 1
+        write(verdict(total, undecodable.pop(total)))
+    seconds = time.perf_counter() - start
+    summary = {
+        "records": total,
+        "matched": matched,
+        "rejected": total - matched,
+        "errors": failed,
+        "seconds": round(seconds, 6),
+        "records_per_second": round(total / seconds, 1) if seconds > 0 else None,
+    }
+    if workers <= 1:
+        summary["early_rejected"] = {name: count - shortcuts[name] for name, count in recognizer.shortcuts.items()}
+    out.write(json.dumps({"summary": summary}) + "\n")
+    return summary
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("cfg", type=argparse.FileType('r'),
                         help="path to a file that specifies a CFG")
-    parser.add_argument("input", type=str,
+    parser.add_argument("input", type=str, nargs="?",
                         help="path to a file whose content is to check whether being accepted by the grammar")
     parser.add_argument("-s", "--string", action="store_true",
                         help="interpret the second positional argument as direct input string rather than a file path")
     parser.add_argument("-l", "--long", action="store_true",
                         help="preserve the long terminals")
     parser.add_argument("-c", "--compile-cnf", action="store_true",
-                        help="compile the grammar to normal form, second positional arg being the output file path")
-    args = parser.parse_args()
+                        help="compile the grammar to normal form, second positional arg being the output file path; "
+                             "the file is in the binary format of mincfg.binary, for CFLRecognizer.load and cpp/")
+    parser.add_argument("--text", action="store_true",
+                        help="with -c, write the rules as text lines `a b c` instead, terminals by their ord()")
+    parser.add_argument("-b", "--build-cache", action="store_true",
+                        help="compile the grammar into the cache of compiled grammars, then exit")
+    parser.add_argument("--profile-grammar", action="store_true",
+                        help="report the size and time after every pass of the conversion into normal form, "
+                             "and the non-terminals producing the most rules, then exit")
+    parser.add_argument("-g", "--generate", type=int, metavar="LENGTH",
+                        help="print random strings of the grammar of LENGTH symbols, one JSON string per line, then exit")
+    parser.add_argument("-n", "--count", type=int, default=1,
+                        help="with -g, the number of strings")
+    parser.add_argument("--near-miss", action="store_true",
+                        help="with -g, edit every string once so that the grammar rejects it")
+    parser.add_argument("--seed", type=int,
+                        help="with -g, the seed of the random generator")
+    parser.add_argument("--batch", action="store_true",
+                        help="match every line of the second positional argument, a file or - for stdin, "
+                             "printing one JSON verdict per line and a JSON summary")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="with --batch, the number of processes matching the lines")
+    parser.add_argument("--chunk-size", type=int, default=64,
+                        help="with --batch and --workers, the number of lines sent to a process at a time")
+    parser.add_argument("--cache-dir", type=str,
+                        help="directory of the cache of compiled grammars; with -b, defaults to $MINCFG_CACHE_DIR or ~/.cache/mincfg")
+    args = parser.parse_intermixed_args()
 
     cfg = args.cfg.read()
 
+    grammar_cache = None
+    if args.cache_dir or args.build_cache:
+        grammar_cache = cache.GrammarCache(args.cache_dir)
+
+    if args.build_cache:
+        grammar_cache.invalidate(cfg, args.long)
+        mincfg.compile(cfg, args.long, cache=grammar_cache)
+        print(grammar_cache.path(cfg, args.long))
+        return
+
+    if args.profile_grammar:
+        profile_grammar(cfg, args.long)
+        return
+
+    if args.generate is not None:
+        recognizer = mincfg.compile(cfg, args.long, cache=grammar_cache)
+        rng = random.Random(args.seed)
+        for _ in range(args.count):
+            string = recognizer.generate(args.generate, rng, args.near_miss)
+            if string is None:
+                kind = "near miss" if args.near_miss else "string"
+                parser.exit(1, f"cannot generate a {kind} of length {args.generate}\n")
+            print(json.dumps(string))
+        return
+
+    if args.input is None:
+        parser.error("the following arguments are required: input")
+
+    if args.compile_cnf and not args.text:
+        mincfg.CFLRecognizer(cfg, args.long).save(args.input)
+        return
+
     if args.compile_cnf:
         if args.long:
             raise Exception("cannot compile when preserving long terminals")
@@ -33,13 +204,22 @@ def main():
                 fd.write(f"{a} {b} {c}\n")
         return
 
+    if args.batch:
+        recognizer = mincfg.compile(cfg, args.long, cache=grammar_cache)
+        if args.input == "-":
+            records = read_records(sys.stdin.buffer)
+        else:
+            records = map_records(args.input)
+        run_batch(recognizer, records, sys.stdout, args.workers, args.chunk_size)
+        return
+
     if args.string:
         string = args.input
     else:
-        with open(string) as fp:
+        with open(args.input) as fp:
             string = fp.read()
 
-    if mincfg.match(cfg, string, args.long):
+    if mincfg.compile(cfg, args.long, cache=grammar_cache).match(string):
         print("Yes")
     else:
         print("No")
@@ -0,0 +1,362 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from . import mincfg
+from . import codegen
+from . import earley
+
+try:
+    from . import vectorized
+    from . import valiant
+except ImportError:
+    vectorized = valiant = None
+
+
+def decide_scan(G, x):
+    '''
+    the original `decide`, which scans all of `G` for every split; kept as a reference to benchmark against.
+    '''
+    n = len(x)
+    N = [[set() for _ in range(n)] for _ in range(n)]
+    for i in range(n):
+        N[i][i] = {x[i]}
+    for s in range(1, n):
+        for i in range(n - s):
+            for k in range(i, i + s):
+                for a, (b, c) in G:
+                    if b in N[i][k] and c in N[k + 1][i + s]:
+                        N[i][i + s].add(a)
+    return -1 in N[0][n - 1]
+
+
+# (grammar file, lexing, input)
+CASES = [
+    ("examples/dna.bnf", False, "ACGT" * 16),
+    ("examples/arithmetic.bnf", False, "(1 + 2) * 3 - 4 / (5 + -6)"),
+    ("examples/simple_html.bnf", False, "<tag1ab=12c=''x1''d=\"\"y2\"\">"),
+    ("examples/bnf.bnf", False, '<a> ::= "x" | <b>\n'),
+    ("examples/c99.bnf", True, "int main(int id1){int id2 = 0; while(id1 > 0) id2 += id1--; return id2;}"),
+]
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_decide():
+    print(f"{'grammar':<28} {'rules':>6} {'n':>4} {'scan (s)':>10} {'indexed (s)':>12} {'bitset (s)':>11} {'numpy (s)':>10} {'earley (s)':>11}")
+    for path, lexing, string in CASES:
+        with open(path) as F:
+            recognizer = mincfg.compile(F.read(), lexing)
+        G = recognizer.grammar_cnf
+        x = mincfg.lexer.lex(G, string) if lexing else string
+        ids = mincfg.intern_symbols(G)
+        index = mincfg.index_rules_bitset(G, ids)
+        r1, t1 = timeit(decide_scan, G, x)
+        r2, t2 = timeit(mincfg.decide, G, x, recognizer.rule_index)
+        r3, t3 = timeit(mincfg.decide_bitset, G, x, ids, index)
+        assert(r1 == r2 == r3)
+        t4 = float("nan")
+        if vectorized is not None:
+            table = vectorized.rule_table(G, ids)
+            chart, t4 = timeit(vectorized.numpy_chart, x, ids, table)
+            assert(bool(chart[len(x), 0, 0]) == r1)
+        rules = earley.index_rules(recognizer.grammar)
+        nullable = mincfg.reverse_closure_e(recognizer.grammar)
+        r5, t5 = timeit(earley.recognize, rules, nullable, x)
+        assert(r5 == r1)
+        print(f"{path:<28} {len(G):>6} {len(x):>4} {t1:>10.4f} {t2:>12.4f} {t3:>11.4f} {t4:>10.4f} {t5:>11.4f}")
+
+
+def bench_scaling(lengths=(16, 32, 64, 128, 256, 512)):
+    '''
+    time CYK against Valiant's algorithm as the input grows, to show where the latter overtakes.
+    '''
+    if valiant is None:
+        print("NumPy is not installed, skipping the CYK / Valiant scaling benchmark")
+        return
+    with open("examples/dna.bnf") as F:
+        recognizer = mincfg.compile(F.read())
+    G = recognizer.grammar_cnf
+    ids = mincfg.intern_symbols(G)
+    index = mincfg.index_rules_bitset(G, ids)
+    table = vectorized.rule_table(G, ids)
+    print(f"{'n':>6} {'cyk (s)':>10} {'bitset (s)':>11} {'valiant (s)':>12}")
+    for n in lengths:
+        x = ("ACGT" * n)[:n]
+        r1, t1 = timeit(mincfg.decide, G, x, recognizer.rule_index)
+        r2, t2 = timeit(mincfg.decide_bitset, G, x, ids, index)
+        chart, t3 = timeit(valiant.valiant_chart, x, ids, table)
+        assert(r1 == r2 == bool(chart[0, 0, n]))
+        print(f"{n:>6} {t1:>10.4f} {t2:>11.4f} {t3:>12.4f}")
+
+
+def bench_throughput(count=2000, chunksize=64):
+    '''
+    time `match_many` on a batch of arithmetic expressions with 1 up to all cores.
+    '''
+    with open("examples/arithmetic.bnf") as F:
+        recognizer = mincfg.CFLRecognizer(F.read(), False)
+    strings = [f"({i} + {i % 7}) * {i % 13} - {i}" for i in range(count)]
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores} | {w for w in (2, 4, 8, 16, 32, 64) if w < cores})
+    print(f"{'workers':>7} {'time (s)':>9} {'strings/s':>10}")
+    for workers in counts:
+        results, t = timeit(lambda: list(recognizer.match_many(strings, workers, chunksize)))
+        assert(all(results))
+        print(f"{workers:>7} {t:>9.4f} {count / t:>10.1f}")
+
+
+def bench_codegen():
+    '''
+    time the code generated for every grammar against the generic `decide` and `decide_bitset`.
+    '''
+    print(f"{'grammar':<28} {'n':>4} {'lines':>6} {'generate (s)':>13} {'decide (s)':>11} {'bitset (s)':>11} {'codegen (s)':>12}")
+    for path, lexing, string in CASES:
+        with open(path) as F:
+            recognizer = mincfg.compile(F.read(), lexing)
+        G = recognizer.grammar_cnf
+        x = mincfg.lexer.lex(G, string) if lexing else string
+        ids = mincfg.intern_symbols(G)
+        index = mincfg.index_rules_bitset(G, ids)
+        source, t0 = timeit(codegen.generate_source, G, ids)
+        code, t1 = timeit(codegen.compile_source, source)
+        fill = codegen.load_fill(code)
+        r1, t2 = timeit(mincfg.decide, G, x, recognizer.rule_index)
+        r2, t3 = timeit(mincfg.decide_bitset, G, x, ids, index)
+        chart, t4 = timeit(codegen.codegen_chart, x, ids, fill)
+        assert(r1 == r2 == (chart[-1] & 1 == 1))
+        print(f"{path:<28} {len(x):>4} {source.count(chr(10)):>6} {t0 + t1:>13.4f} {t2:>11.4f} {t3:>11.4f} {t4:>12.4f}")
+
+
+def bench_compile():
+    '''
+    time parsing and conversion into CNF of every grammar in examples/.
+    '''
+    print(f"{'grammar':<32} {'lexing':>6} {'rules':>6} {'cnf':>6} {'parse (s)':>10} {'to_cnf (s)':>11}")
+    for path in sorted(glob.glob("examples/*.bnf")):
+        with open(path) as F:
+            cfgex = F.read()
+        for lexing in (False, True):
+            G, t1 = timeit(mincfg.parse, cfgex, lexing)
+            G_cnf, t2 = timeit(mincfg.to_cnf, G)
+            print(f"{path:<32} {lexing!s:>6} {len(G):>6} {len(G_cnf):>6} {t1:>10.4f} {t2:>11.4f}")
+
+
+def print_tables():
+    bench_compile()
+    print()
+    bench_decide()
+    print()
+    bench_codegen()
+    print()
+    bench_scaling()
+    print()
+    bench_throughput()
+
+
+# generators of an accepted input of about `n` symbols, for every grammar of the suite
+def dna_input(n):
+    return ("ACGT" * n)[:max(n, 1)]
+
+
+def arithmetic_input(n):
+    return "(1 + 2) * " * max(0, (n - 1) // 10) + "3"
+
+
+def parens_input(n):
+    return "(())" * (n // 4) + "()" * (n % 4 // 2)
+
+
+def simple_html_input(n):
+    return "<t" + "a=1" * max(1, (n - 3) // 3) + ">"
+
+
+def c99_input(n):
+    # in tokens: 7 + 5 + 6 per statement + 4
+    body = "id2 = id2 + id1; " * max(0, (n - 16) // 6)
+    return "int main(int id1){int id2 = 0; " + body + "return id2;}"
+
+
+def bnf_input(n):
+    return '<a> ::= "x" | <b>\n' * max(1, (n + 9) // 18)
+
+
+# name: (grammar file, or the grammar itself if not in examples/; lexing; input generator)
+SUITE = {
+    "dna": ("examples/dna.bnf", False, dna_input),
+    "arithmetic": ("examples/arithmetic.bnf", False, arithmetic_input),
+    "parens": ("<S> ::= <S> <S> | '(' <S> ')' | ''", False, parens_input),
+    "simple_html": ("examples/simple_html.bnf", False, simple_html_input),
+    "c99": ("examples/c99.bnf", True, c99_input),
+    "bnf": ("examples/bnf.bnf", False, bnf_input),
+}
+
+LENGTHS = (16, 32, 64, 128)
+
+# bump whenever the layout of the report changes
+REPORT_VERSION = 1
+
+
+def peak_memory(func, *args):
+    '''
+    get the peak number of bytes allocated by Python while calling `func`, as traced by tracemalloc.
+    '''
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compile_recognizer(cfgex, lexing, engine):
+    '''
+    compile `cfgex` into a new recognizer, bypassing every cache, and build all it builds on first use.
+    '''
+    recognizer = mincfg.CFLRecognizer(cfgex, lexing, engine)
+    recognizer.grammar_cnf
+    recognizer._prepare()
+    return recognizer
+
+
+# kinds of inputs of the suite: from the generators of `SUITE`, or sampled from the grammar by
+# `CFLRecognizer.generate`, as is or edited into near misses
+INPUTS = ("fixed", "sampled", "near-miss")
+
+
+def run_suite(names=None, lengths=LENGTHS, engine="cyk", repeat=3, inputs="fixed", seed=0):
+    '''
+    benchmark every grammar of `SUITE` in `names`, on inputs of every length in `lengths`, and get a report as a dict.
+    `inputs` is one of `INPUTS`; sampled inputs are drawn with `seed`, and lengths the grammar cannot produce are skipped.
+    times are the best of `repeat` runs; peak memory is measured by a separate traced run.
+    '''
+    rng = random.Random(seed)
+    report = {
+        "version": REPORT_VERSION,
+        "engine": engine,
+        "inputs": inputs,
+        "python": platform.python_version(),
+        "grammars": {},
+    }
+    for name in names or SUITE:
+        source, lexing, generate = SUITE[name]
+        if source.startswith("examples/"):
+            with open(source) as F:
+                source = F.read()
+        recognizer, t = timeit(compile_recognizer, source, lexing, engine)
+        entry = {
+            "rules": len(recognizer.grammar_cnf),
+            "compile_seconds": t,
+            "compile_peak_bytes": peak_memory(compile_recognizer, source, lexing, engine),
+            "matches": [],
+        }
+        for n in lengths:
+            if inputs == "fixed":
+                string = generate(n)
+            else:
+                string = recognizer.generate(n, rng, inputs == "near-miss")
+                if string is None:
+                    continue
+            matched, t = timeit(recognizer.match, string)
+            for _ in range(repeat - 1):
+                t = min(t, timeit(recognizer.match, string)[1])
+            entry["matches"].append({
+                "length": len(recognizer.lexer.analyze(string)) if lexing else len(string),
+                "matched": matched,
+                "seconds": t,
+                "peak_bytes": peak_memory(recognizer.match, string),
+            })
+        report["grammars"][name] = entry
+    return report
+
+
+def compare(report, baseline, threshold=1.25):
+    '''
+    print how every measure of `report` changed from `baseline`, another report.
+    return the number of regressions: measures growing by more than `threshold` times, or results that differ.
+    '''
+    regressions = 0
+
+    def line(name, what, old, new):
+        nonlocal regressions
+        ratio = new / old if old else float("inf") if new else 1.0
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "REGRESSION"
+        print(f"{name:<12} {what:<20} {old:>14.6g} {new:>14.6g} {ratio:>7.2f} {flag}")
+
+    print(f"{'grammar':<12} {'measure':<20} {'baseline':>14} {'current':>14} {'ratio':>7}")
+    for name, entry in report["grammars"].items():
+        old = baseline["grammars"].get(name)
+        if old is None:
+            continue
+        line(name, "compile s", old["compile_seconds"], entry["compile_seconds"])
+        line(name, "compile peak B", old["compile_peak_bytes"], entry["compile_peak_bytes"])
+        old_matches = {m["length"]: m for m in old["matches"]}
+        for m in entry["matches"]:
+            o = old_matches.get(m["length"])
+            if o is None:
+                continue
+            if o["matched"] != m["matched"]:
+                regressions += 1
+                print(f"{name:<12} {'n=' + str(m['length']):<20} matched {o['matched']} -> {m['matched']} REGRESSION")
+            line(name, f"n={m['length']} match s", o["seconds"], m["seconds"])
+            line(name, f"n={m['length']} peak B", o["peak_bytes"], m["peak_bytes"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m mincfg.bench")
+    parser.add_argument("--grammars", nargs="+", choices=list(SUITE),
+                        help="grammars to benchmark; all by default")
+    parser.add_argument("--lengths", nargs="+", type=int, default=list(LENGTHS),
+                        help="input lengths, in symbols")
+    parser.add_argument("--engine", choices=mincfg.ENGINES, default="cyk")
+    parser.add_argument("--inputs", choices=INPUTS, default="fixed",
+                        help="inputs from generators written for every grammar, or sampled from the grammar")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the sampled inputs")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs of every match, of which the best is kept")
+    parser.add_argument("-o", "--output", type=str,
+                        help="path to write the JSON report to, instead of the standard output")
+    parser.add_argument("--baseline", type=str,
+                        help="path to a saved JSON report to compare against; exits with 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="ratio to the baseline above which a measure counts as a regression")
+    parser.add_argument("--tables", action="store_true",
+                        help="print the comparison tables of the engines instead")
+    args = parser.parse_args()
+
+    if args.tables:
+        print_tables()
+        return
+
+    report = run_suite(args.grammars, args.lengths, args.engine, args.repeat, args.inputs, args.seed)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2)
+    elif args.baseline is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as fd:
+            baseline = json.load(fd)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
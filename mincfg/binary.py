@@ -0,0 +1,144 @@
+import array
+import mmap
+import os
+import struct
+import sys
+
+# the layout, all little-endian, of a compiled grammar file:
+#   header: HEADER, below
+#   nonterminals: int32[nonterminals], the number of the non-terminal of every id; id 0 is the starting -1
+#   terminals: uint32[2 * terminals], (offset, length) of every terminal in strings; terminal t has id nonterminals + t
+#   left_offsets: uint32[nonterminals + terminals + 1], the rules with left symbol b are rules[left_offsets[b]:left_offsets[b + 1]]
+#   rules: uint32[3 * rules], (left, right, head) ids of every rule A -> B C, sorted
+#   singles: uint32[singles], ids of the terminals the starting -1 derives alone
+#   strings: the terminals, UTF-8 encoded
+MAGIC = b"MINCFGB\0"
+
+# bump whenever the layout changes; files of another version are never read
+FORMAT_VERSION = 1
+
+# magic, version, flags, nonterminals, terminals, rules, singles, strings bytes, reserved
+HEADER = struct.Struct("<8s8I")
+
+# flags
+LEXING = 1
+ACCEPTS_EMPTY = 2
+
+
+def dump(path, G, lexing, accepts_empty, singles):
+    '''
+    write CFG `G` in CNF to `path`, with the answers on strings shorter than two: whether the starting -1
+    `accepts_empty`, and the set of terminals `singles` it derives alone.
+    '''
+    nonterminals = sorted({a for a, _ in G} | {s for _, subs in G for s in subs if type(s) is int} | {-1},
+                          reverse=True)
+    terminals = sorted({s for _, subs in G for s in subs if type(s) is str} | set(singles))
+    ids = {s: i for i, s in enumerate(nonterminals)}
+    ids.update((t, len(nonterminals) + i) for i, t in enumerate(terminals))
+
+    rules = sorted({(ids[b], ids[c], ids[a]) for a, (b, c) in G})
+    left_offsets = [0] * (len(ids) + 1)
+    for b, _, _ in rules:
+        left_offsets[b + 1] += 1
+    for i in range(len(ids)):
+        left_offsets[i + 1] += left_offsets[i]
+
+    strings = bytearray()
+    spans = []
+    for t in terminals:
+        encoded = t.encode()
+        spans += [len(strings), len(encoded)]
+        strings += encoded
+
+    flags = (LEXING if lexing else 0) | (ACCEPTS_EMPTY if accepts_empty else 0)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(nonterminals), len(terminals),
+                         len(rules), len(singles), len(strings), 0)
+    sections = [
+        array.array('i', nonterminals),
+        array.array('I', spans),
+        array.array('I', left_offsets),
+        array.array('I', [i for rule in rules for i in rule]),
+        array.array('I', sorted(ids[t] for t in singles)),
+    ]
+    # write aside and rename, so that processes mapping the file never see it partially written
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as fd:
+        fd.write(header)
+        for section in sections:
+            if sys.byteorder != "little":
+                section.byteswap()
+            fd.write(section.tobytes())
+        fd.write(strings)
+    os.replace(tmp, path)
+
+
+class CompiledGrammar:
+    '''
+    a grammar file written by `dump`, mapped into memory read-only, so that processes loading the same file
+    share one copy in the page cache. every section is a memoryview of the mapping, decoded on access.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as fd:
+            self.mapping = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mapping) < HEADER.size:
+            raise ValueError(f"not a compiled grammar: {path}")
+        (magic, version, flags, n_nonterminals, n_terminals, n_rules, n_singles,
+         n_strings, _) = HEADER.unpack_from(self.mapping)
+        if magic != MAGIC:
+            raise ValueError(f"not a compiled grammar: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported version {version} of compiled grammar: {path}")
+        self.lexing = bool(flags & LEXING)
+        self.accepts_empty = bool(flags & ACCEPTS_EMPTY)
+
+        view = memoryview(self.mapping)
+        offset = HEADER.size
+
+        def section(typecode, count):
+            nonlocal offset
+            size = 4 * count
+            data = view[offset:offset + size]
+            offset += size
+            if sys.byteorder == "little":
+                return data.cast(typecode)
+            swapped = array.array(typecode, data)
+            swapped.byteswap()
+            return swapped
+
+        self.nonterminals = section('i', n_nonterminals)
+        self.terminal_spans = section('I', 2 * n_terminals)
+        self.left_offsets = section('I', n_nonterminals + n_terminals + 1)
+        self.rule_ids = section('I', 3 * n_rules)
+        self.single_ids = section('I', n_singles)
+        self.strings = view[offset:offset + n_strings]
+        if len(self.strings) != n_strings:
+            raise ValueError(f"truncated compiled grammar: {path}")
+
+    def symbols(self):
+        '''
+        get the list of all symbols, indexed by id.
+        '''
+        spans = self.terminal_spans
+        terminals = [bytes(self.strings[spans[i]:spans[i] + spans[i + 1]]).decode()
+                     for i in range(0, len(spans), 2)]
+        return list(self.nonterminals) + terminals
+
+    def rules(self):
+        '''
+        get the grammar as a list of rules (A, [B, C]), sorted by right-hand side.
+        '''
+        symbols = self.symbols()
+        r = self.rule_ids
+        return [(symbols[r[i + 2]], [symbols[r[i]], symbols[r[i + 1]]]) for i in range(0, len(r), 3)]
+
+    def singles(self):
+        symbols = self.symbols()
+        return {symbols[i] for i in self.single_ids}
+
+
+def load(path):
+    '''
+    map the grammar file at `path` into memory as a `CompiledGrammar`.
+    '''
+    return CompiledGrammar(path)
@@ -0,0 +1,132 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+
+# bump whenever the cached data, or the normalization producing it, changes;
+# entries written under another version are never read again
+FORMAT_VERSION = 2
+
+# bump whenever the code generated for the "codegen" engine changes
+CODE_VERSION = 2
+
+MAGIC = b"MINCFG"
+
+
+def default_directory():
+    '''
+    get the cache directory to use when none is given: $MINCFG_CACHE_DIR, or else ~/.cache/mincfg.
+    '''
+    directory = os.environ.get("MINCFG_CACHE_DIR")
+    if directory:
+        return directory
+    return os.path.join(os.path.expanduser("~"), ".cache", "mincfg")
+
+
+class GrammarCache:
+    '''
+    an on-disk cache of compiled grammars, keyed by a hash of the grammar expression and the `lexing` flag.
+    every entry is one file: MAGIC, FORMAT_VERSION and the marshal version, followed by the marshalled
+    (grammar, grammar_cnf).
+    the code generated for the "codegen" engine is kept in a second file, its header followed by CODE_VERSION and
+    the bytecode magic number of the interpreter, as code objects only load into the version that compiled them.
+    '''
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_directory()
+
+    def key(self, cfgex, lexing):
+        h = hashlib.sha256()
+        h.update(f"{FORMAT_VERSION}:{int(bool(lexing))}:".encode())
+        h.update(cfgex.encode())
+        return h.hexdigest()
+
+    def path(self, cfgex, lexing):
+        return os.path.join(self.directory, self.key(cfgex, lexing) + ".cfg")
+
+    def code_path(self, cfgex, lexing):
+        return os.path.join(self.directory, self.key(cfgex, lexing) + ".code")
+
+    def header(self):
+        return MAGIC + bytes([FORMAT_VERSION, marshal.version])
+
+    def code_header(self):
+        return self.header() + bytes([CODE_VERSION]) + importlib.util.MAGIC_NUMBER
+
+    def load(self, cfgex, lexing):
+        '''
+        get the cached (grammar, grammar_cnf) of `cfgex`, or None if it is not cached.
+        an entry that cannot be read is removed.
+        '''
+        entry = self._read(self.path(cfgex, lexing), self.header())
+        if entry is None:
+            return None
+        grammar, grammar_cnf = entry
+        return grammar, grammar_cnf
+
+    def store(self, cfgex, lexing, grammar, grammar_cnf):
+        '''
+        cache the compiled `grammar` and `grammar_cnf` of `cfgex`.
+        '''
+        return self._write(self.path(cfgex, lexing), self.header(), (grammar, grammar_cnf))
+
+    def load_code(self, cfgex, lexing):
+        '''
+        get the cached code object of `cfgex` for the "codegen" engine, or None if it is not cached.
+        '''
+        return self._read(self.code_path(cfgex, lexing), self.code_header())
+
+    def store_code(self, cfgex, lexing, code):
+        return self._write(self.code_path(cfgex, lexing), self.code_header(), code)
+
+    def _read(self, path, header):
+        try:
+            with open(path, 'rb') as fd:
+                data = fd.read()
+        except OSError:
+            return None
+        try:
+            if not data.startswith(header):
+                raise ValueError("bad header")
+            return marshal.loads(data[len(header):])
+        except (ValueError, EOFError, TypeError):
+            self._remove(path)
+            return None
+
+    def _write(self, path, header, value):
+        os.makedirs(self.directory, exist_ok=True)
+        # write aside and rename, so that concurrent readers never see a partial entry
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as fd:
+            fd.write(header)
+            fd.write(marshal.dumps(value))
+        os.replace(tmp, path)
+        return path
+
+    def invalidate(self, cfgex, lexing):
+        '''
+        remove the entry of `cfgex`, with its code; return whether there was one.
+        '''
+        self._remove(self.code_path(cfgex, lexing))
+        return self._remove(self.path(cfgex, lexing))
+
+    def clear(self):
+        '''
+        remove all entries; return how many were removed.
+        '''
+        count = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith(".code"):
+                    self._remove(path)
+                elif name.endswith(".cfg") and self._remove(path):
+                    count += 1
+        return count
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,118 @@
+from .mincfg import chart_rows, stops_chart
+
+
+# the chart fill every generated module defines, with the rules in place of {tree}
+TEMPLATE = """\
+def fill(x, ids, rows, counters=None):
+    n = len(x)
+    N = [0] * (n * (n + 1) // 2)
+    for i in range(n):
+        if x[i] in ids:
+            N[i] = 1 << ids[x[i]]
+    empty_since = None
+    for s in range(1, n):
+        row = rows[s]
+        filled = False
+        for i in range(n - s):
+            cell = 0
+            for k in range(i, i + s):
+                left = N[rows[k - i] + i] & {lefts}
+                if not left:
+                    continue
+                right = N[rows[i + s - k - 1] + k + 1]
+                if not right:
+                    continue
+                while left:
+                    low = left & -left
+                    left ^= low
+{tree}
+            if cell:
+                N[row + i] = cell
+                filled = True
+        if filled:
+            empty_since = None
+        else:
+            if empty_since is None:
+                empty_since = s + 1
+            if s + 1 < n and stops_chart(s + 1, empty_since):
+                if counters is not None:
+                    counters["empty_diagonal"] += 1
+                break
+    return N
+"""
+
+
+def generate_source(G, ids):
+    '''
+    generate the source of a module defining `fill(x, ids, rows, counters=None)`, the same as `mincfg.bitset_chart`
+    for CFG `G` in CNF over the symbol ids `ids` (see `mincfg.intern_symbols`), with `rows` the result of
+    `chart_rows(len(x))`; the module needs `stops_chart` in its namespace, as `load_fill` gives it.
+    instead of looking the rules up, every bit b of a left cell is found by a balanced tree of comparisons,
+    and leads to tests of the right cell against the rules A -> b C, unrolled, with the ids as constants;
+    the rules of b with the same heads A are tested at once.
+    '''
+    by_left = {}  # key: id of b; value: {bit of c: mask of all A such that A -> b c}
+    for a, (b, c) in G:
+        row = by_left.setdefault(ids[b], {})
+        c_bit = 1 << ids[c]
+        row[c_bit] = row.get(c_bit, 0) | (1 << ids[a])
+    lefts = 0
+    for b in by_left:
+        lefts |= 1 << b
+
+    lines = []
+
+    def leaf(b, indent):
+        # group the c by the heads they lead to
+        by_heads = {}
+        for c_bit, heads in by_left[b].items():
+            by_heads[heads] = by_heads.get(heads, 0) | c_bit
+        if len(by_heads) > 2:
+            # most of the time, none of them is in the right cell
+            mask = 0
+            for c_mask in by_heads.values():
+                mask |= c_mask
+            lines.append(f"{indent}if right & {mask:#x}:")
+            indent += "    "
+        for heads, c_mask in sorted(by_heads.items()):
+            lines.append(f"{indent}if right & {c_mask:#x}:")
+            lines.append(f"{indent}    cell |= {heads:#x}")
+
+    def tree(bs, indent):
+        if len(bs) == 1:
+            leaf(bs[0], indent)
+            return
+        mid = len(bs) // 2
+        lines.append(f"{indent}if low < {1 << bs[mid]:#x}:")
+        tree(bs[:mid], indent + "    ")
+        lines.append(f"{indent}else:")
+        tree(bs[mid:], indent + "    ")
+
+    if by_left:
+        tree(sorted(by_left), " " * 20)
+    else:
+        lines.append(" " * 20 + "pass")
+    return TEMPLATE.format(lefts=f"{lefts:#x}", tree="\n".join(lines))
+
+
+def compile_source(source):
+    '''
+    compile the source from `generate_source` into a code object, which `marshal` can store.
+    '''
+    return compile(source, "<mincfg grammar>", "exec")
+
+
+def load_fill(code):
+    '''
+    get the `fill` function of a code object from `compile_source`.
+    '''
+    namespace = {"stops_chart": stops_chart}
+    exec(code, namespace)
+    return namespace["fill"]
+
+
+def codegen_chart(x, ids, fill, counters=None):
+    '''
+    fill the chart of string `x` with `fill` from `load_fill`; see `mincfg.bitset_chart`.
+    '''
+    return fill(x, ids, chart_rows(len(x)), counters)
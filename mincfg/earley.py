@@ -0,0 +1,133 @@
+def index_rules(G):
+    '''
+    get the rules of CFG `G` by their left-hand side, as a dict mapping each non-terminal to a list of bodies.
+    a body is a tuple of symbols, with the empty string '' dropped.
+    '''
+    rules = {}
+    for nt, subs in G:
+        rules.setdefault(nt, []).append(tuple(s for s in subs if s != ''))
+    return rules
+
+
+class EarleyRecognizer:
+    '''
+    Earley's algorithm, fed one symbol at a time, directly on a CFG that need not be in CNF.
+    `rules` is the result of `index_rules(G)`, and `nullable` is the set of non-terminals that may derive ''.
+    empty derivations are handled as suggested by Aycock and Horspool (2002), "Practical Earley Parsing".
+    right recursion is linear, by the transitive items of Leo (1991), "A general context-free parsing algorithm
+    running in linear time on every LR(k) grammar without using lookahead".
+
+    an item (A, body, dot, origin) means that body[:dot] of rule A -> body derives the input from `origin` onwards.
+    '''
+
+    def __init__(self, rules, nullable, start=-1):
+        self.rules = rules
+        self.nullable = nullable
+        self.start = start
+        # waiting[j][B] are the items of column j whose next symbol is non-terminal B
+        self.waiting = []
+        # leo[j][B] is the topmost complete item of the deterministic chain of completions of B at column j,
+        # or None if there is none; filled on demand, once column j is closed
+        self.leo = []
+        # scanning[t] are the items of the last column whose next symbol is terminal t
+        self.scanning = {}
+        self.accepted = False
+        self._close([(start, body, 0, 0) for body in rules.get(start, ())])
+
+    def feed(self, symbol):
+        '''
+        consume the next symbol of the input.
+        return False if no continuation of the input read so far can be accepted.
+        '''
+        items = [(nt, body, dot + 1, origin)
+                 for nt, body, dot, origin in self.scanning.get(symbol, ())]
+        alive = len(items) > 0
+        self._close(items)
+        return alive
+
+    def _close(self, items):
+        j = len(self.waiting)
+        waiting = {}
+        scanning = {}
+        self.waiting.append(waiting)
+        self.leo.append({})
+        self.accepted = False
+        seen = set(items)
+        predicted = set()
+
+        def add(item):
+            if item not in seen:
+                seen.add(item)
+                items.append(item)
+
+        while items:
+            item = items.pop()
+            nt, body, dot, origin = item
+            if dot == len(body):
+                # complete; an empty completion (origin == j) is covered by the nullable set
+                if origin < j:
+                    top = self._leo(origin, nt)
+                    if top is not None:
+                        add(top)
+                    else:
+                        for nt2, body2, dot2, origin2 in self.waiting[origin].get(nt, ()):
+                            add((nt2, body2, dot2 + 1, origin2))
+                if nt == self.start and origin == 0:
+                    self.accepted = True
+                continue
+            s = body[dot]
+            if type(s) is int:
+                # predict
+                waiting.setdefault(s, []).append(item)
+                if s not in predicted:
+                    predicted.add(s)
+                    for body2 in self.rules.get(s, ()):
+                        add((s, body2, 0, j))
+                if s in self.nullable:
+                    add((nt, body, dot + 1, origin))
+            else:
+                scanning.setdefault(s, []).append(item)
+        self.scanning = scanning
+
+    def _leo(self, j, nt):
+        '''
+        get the item completing `nt` from column `j` leads to, through every completion that leaves a single item,
+        itself complete: completing it directly skips the chain in between. None if the first completion does not.
+        the chain ends at a complete item of the start symbol from column 0, which must not be skipped, as it accepts.
+        '''
+        chain = []
+        top = None
+        while True:
+            memo = self.leo[j]
+            if nt in memo:
+                top = memo[nt]
+                break
+            items = self.waiting[j].get(nt, ())
+            if len(items) != 1:
+                memo[nt] = None
+                break
+            nt2, body2, dot2, origin2 = items[0]
+            if dot2 + 1 != len(body2):
+                memo[nt] = None
+                break
+            chain.append((memo, nt, (nt2, body2, dot2 + 1, origin2)))
+            if origin2 == j or (nt2 == self.start and origin2 == 0):
+                break
+            j, nt = origin2, nt2
+        # every link of the chain leads to the same top, the last complete item if nothing is above it
+        if chain and top is None:
+            top = chain[-1][2]
+        for memo, nt, _ in chain:
+            memo[nt] = top
+        return top
+
+
+def recognize(rules, nullable, x, start=-1):
+    '''
+    decide if the sequence of terminals `x` is in L(G), where `rules` and `nullable` are as in `EarleyRecognizer`.
+    '''
+    recognizer = EarleyRecognizer(rules, nullable, start)
+    for s in x:
+        if not recognizer.feed(s):
+            return False
+    return recognizer.accepted
@@ -0,0 +1,150 @@
+from .mincfg import chart_rows, index_rules
+
+
+def forest_chart(G, x, index=None):
+    '''
+    same as `mincfg.cyk_chart`, but every cell maps each symbol that can derive the substring to its back-pointers:
+    the list of all (k, B, C) such that it derives the substring by rule A -> B C, with B deriving
+    the substring up to position k included and C the rest; a terminal maps to an empty tuple.
+    '''
+    n = len(x)
+    if index is None:
+        index = index_rules(G)
+
+    rows = chart_rows(n)
+    empty = {}
+    N = [empty] * (n * (n + 1) // 2)
+    for i in range(n):
+        N[i] = {x[i]: ()}
+
+    for s in range(1, n):
+        for i in range(n - s):
+            cell = {}
+            for k in range(i, i + s):
+                right = N[rows[i + s - k - 1] + k + 1]
+                if not right:
+                    continue
+                for b in N[rows[k - i] + i]:
+                    row = index.get(b)
+                    if row is None:
+                        continue
+                    for c in right:
+                        heads = row.get(c)
+                        if heads is not None:
+                            for a in heads:
+                                cell.setdefault(a, []).append((k, b, c))
+            if cell:
+                N[rows[s] + i] = cell
+
+    return N
+
+
+class ParseForest:
+    '''
+    a shared packed parse forest (SPPF) of string `x` by a CFG in CNF whose starting -1 derives it.
+    a node is a key (symbol, i, j) for a symbol deriving x[i:j]; `nodes` maps every non-terminal node
+    reachable from `root` to its packed alternatives, each a tuple of child nodes.
+    a sub-forest shared by several trees is stored once, so the forest is at most cubic in len(x)
+    even when the number of trees is exponential.
+
+    non-terminals below `lowest` were introduced by `mincfg.eliminate_long_rules`; trees splice them out,
+    so that every tree node is labelled with a non-terminal of the grammar as parsed.
+    '''
+
+    def __init__(self, x, nodes, lowest):
+        self.x = x
+        self.nodes = nodes
+        self.lowest = lowest
+        self.root = (-1, 0, len(x))
+
+    @classmethod
+    def from_chart(cls, x, chart, lowest):
+        '''
+        keep the nodes of `forest_chart` reachable from the root; the root must be derivable.
+        '''
+        rows = chart_rows(len(x))
+        nodes = {}
+        stack = [(-1, 0, len(x))]
+        while stack:
+            node = stack.pop()
+            a, i, j = node
+            alternatives = []
+            for k, b, c in chart[rows[j - i - 1] + i][a]:
+                left, right = (b, i, k + 1), (c, k + 1, j)
+                alternatives.append((left, right))
+                for child in (left, right):
+                    if type(child[0]) is int and child not in nodes:
+                        # reserve it, so that it is pushed once
+                        nodes[child] = None
+                        stack.append(child)
+            nodes[node] = alternatives
+        return cls(x, nodes, lowest)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def count(self):
+        '''
+        get the number of derivation trees, without enumerating them.
+        '''
+        counts = {}
+        # children span strictly less than their parent
+        for node in sorted(self.nodes, key=lambda node: node[2] - node[1]):
+            total = 0
+            for alternative in self.nodes[node]:
+                product = 1
+                for child in alternative:
+                    product *= counts.get(child, 1)
+                total += product
+            counts[node] = total
+        return counts.get(self.root, 0)
+
+    def trees(self):
+        '''
+        iterate over the derivation trees one at a time, each built only when reached.
+        a tree is (non-terminal, children), where every child is either a tree or a terminal.
+        non-terminals deriving '' and short rules A -> B folded by the conversion into CNF do not show.
+        '''
+        # a tree is fixed by the alternative chosen at each of its non-terminal nodes, in preorder;
+        # the next tree changes the last choice that has alternatives left, and takes the first ones after it
+        choices = []
+        while True:
+            tree, counts = self._build(choices)
+            yield tree
+            while choices and choices[-1] + 1 == counts[len(choices) - 1]:
+                choices.pop()
+            if not choices:
+                return
+            choices[-1] += 1
+
+    def _build(self, choices):
+        '''
+        build the tree of the alternatives `choices`, extended with the first alternatives of the nodes past its end;
+        get the tree, and the number of alternatives of each choice.
+        '''
+        counts = []
+        # the children of every node being built, innermost last
+        built = [[]]
+        stack = [(self.root, True)]
+        while stack:
+            node, enter = stack.pop()
+            symbol = node[0]
+            if type(symbol) is str:
+                built[-1].append(symbol)
+            elif enter:
+                alternatives = self.nodes[node]
+                if len(counts) == len(choices):
+                    choices.append(0)
+                alternative = alternatives[choices[len(counts)]]
+                counts.append(len(alternatives))
+                built.append([])
+                stack.append((node, False))
+                for child in reversed(alternative):
+                    stack.append((child, True))
+            else:
+                children = built.pop()
+                if symbol < self.lowest:
+                    built[-1].extend(children)
+                else:
+                    built[-1].append((symbol, children))
+        return built[0][0], counts
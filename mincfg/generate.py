@@ -0,0 +1,116 @@
+import random
+
+
+class SentenceGenerator:
+    '''
+    sample strings of a given length from a CFG `G` in CNF, uniformly among all derivation trees of that length.
+    every symbol A gets counts[A][l], the number of its derivation trees of l terminals, for l up to `max_length`,
+    so that sampling walks down the trees choosing every rule and split point by these counts, never rejecting.
+    counting is in O(|G| max_length^2) big-integer products, and the table grows on demand.
+    strings shorter than two come from `empty` and `singles`, as CNF rules have two symbols.
+    '''
+
+    def __init__(self, G, max_length=0, empty=False, singles=()):
+        self.empty = empty
+        self.singles = sorted(singles)
+        self.rules = {}  # key: non-terminal; value: list of (B, C) of its rules
+        for a, (b, c) in G:
+            self.rules.setdefault(a, []).append((b, c))
+        self.counts = {}
+        # support[A] are the lengths l with counts[A][l] > 0, in increasing order
+        self.support = {}
+        for a, (b, c) in G:
+            for s in (a, b, c):
+                if s not in self.counts:
+                    self.counts[s] = [0, 1] if type(s) is str else [0, 0]
+                    self.support[s] = [1] if type(s) is str else []
+        self.max_length = 1
+        self.extend(max_length)
+
+    def extend(self, max_length):
+        '''
+        count the derivations of up to `max_length` terminals.
+        '''
+        for l in range(self.max_length + 1, max_length + 1):
+            for s, counts in self.counts.items():
+                counts.append(0)
+            for a, rules in self.rules.items():
+                total = 0
+                for b, c in rules:
+                    cb, cc = self.counts[b], self.counts[c]
+                    for k in self.support[b]:
+                        if k >= l:
+                            break
+                        total += cb[k] * cc[l - k]
+                if total:
+                    self.counts[a][l] = total
+                    self.support[a].append(l)
+        self.max_length = max(self.max_length, max_length)
+
+    def count(self, length, start=-1):
+        '''
+        get the number of derivation trees of `length` terminals from `start`.
+        '''
+        if length < 2:
+            return int(self.empty) if length == 0 else len(self.singles)
+        self.extend(length)
+        return self.counts[start][length] if start in self.counts else 0
+
+    def sample(self, length, rng=random, start=-1):
+        '''
+        get a list of `length` terminals derived from `start`, drawn with `rng`, or None if there is none.
+        '''
+        total = self.count(length, start)
+        if total == 0:
+            return None
+        if length == 0:
+            return []
+        elif length == 1:
+            return [rng.choice(self.singles)]
+
+        out = []
+        stack = [(start, length)]
+        while stack:
+            a, l = stack.pop()
+            if type(a) is str:
+                out.append(a)
+                continue
+            # pick the r-th derivation tree of a of l terminals
+            r = rng.randrange(self.counts[a][l])
+            for b, c in self.rules[a]:
+                cb, cc = self.counts[b], self.counts[c]
+                for k in self.support[b]:
+                    if k >= l:
+                        break
+                    r -= cb[k] * cc[l - k]
+                    if r < 0:
+                        break
+                if r < 0:
+                    break
+            stack.append((c, l - k))
+            stack.append((b, k))
+        return out
+
+
+def mutate(x, alphabet, rng=random):
+    '''
+    get a copy of the list of terminals `x` with one random edit: a deletion, an insertion or a substitution
+    of a terminal of `alphabet`, or a swap of two neighbours.
+    '''
+    x = list(x)
+    edits = ["insert"]
+    if x:
+        edits += ["delete", "substitute"]
+    if len(x) > 1:
+        edits.append("swap")
+    edit = rng.choice(edits)
+    if edit == "insert":
+        x.insert(rng.randint(0, len(x)), rng.choice(alphabet))
+    elif edit == "delete":
+        del x[rng.randrange(len(x))]
+    elif edit == "substitute":
+        x[rng.randrange(len(x))] = rng.choice(alphabet)
+    else:
+        i = rng.randrange(len(x) - 1)
+        x[i], x[i + 1] = x[i + 1], x[i]
+    return x
@@ -20,50 +20,124 @@ class ParsingException(Exception):
         return self.fulldesc
 
 
-def lex(G, x):
+def terminals(G):
     '''
-    break down string @x into terminals given CFG @G.
+    get the set of terminals of CFG @G, leaving out the empty string.
     '''
-    terminals = set()
+    out = set()
     for nt, subs in G:
         for s in subs:
-            if type(s) is str:
-                terminals.add(s)
-    lexer = Lexer(terminals)
+            if type(s) is str and s != '':
+                out.add(s)
+    return out
+
+
+def lex(G, x):
+    '''
+    break down string @x into terminals given CFG @G.
+    '''
+    lexer = Lexer(terminals(G))
     return lexer.analyze(x)
 
 
+def read_chunks(source, chunk_size=1 << 16):
+    '''
+    iterate over @source, a file-like object read @chunk_size characters at a time, or an iterable of strings.
+    '''
+    if hasattr(source, "read"):
+        return iter(lambda: source.read(chunk_size), '')
+    return iter(source)
+
+
 class Lexer:
+    '''
+    longest-match tokenizer over a trie of @tokens; whitespace between tokens is skipped.
+    '''
 
     def __init__(self, tokens):
-        self.tokens = {}
+        # a trie node maps a character to the next node, and None to the token ending at it
+        self.trie = {}
         for tk in tokens:
-            s = len(tk)
-            if s not in self.tokens:
-                self.tokens[s] = []
-            self.tokens[s].append(tk)
-        self.token_lengths = sorted(self.tokens.keys(), reverse=True)
+            node = self.trie
+            for ch in tk:
+                node = node.setdefault(ch, {})
+            node[None] = tk
+        self.whitespace = frozenset(string.whitespace)
 
     def analyze(self, input_str):
-        out = []
+        return [token for token, _, _ in self.tokenize(input_str)]
 
+    def tokenize(self, input_str, skip_unknown=False):
+        '''
+        iterate over the tokens of @input_str as (token, start, end), where input_str[start:end] is the token.
+        if @skip_unknown, a character that starts no token is yielded as (None, start, start + 1) instead of raising.
+        '''
+        n = len(input_str)
         i = 0
-        while i < len(input_str):
-            if input_str[i] in string.whitespace:
+        while i < n:
+            if input_str[i] in self.whitespace:
                 i += 1
                 continue
-            matched = False
-            for s in self.token_lengths:
-                ptk = input_str[i: i + s]
-                for tk in self.tokens[s]:
-                    if tk == ptk:
-                        out.append(ptk)
-                        i += s
-                        matched = True
-                        break
-                if matched:
+            # walk down the trie as far as the input goes, remembering the last token passed
+            node = self.trie
+            token = None
+            j = i
+            while j < n:
+                node = node.get(input_str[j])
+                if node is None:
                     break
-            if not matched:
-                raise ParsingException("unknown token", input_str, i)
+                j += 1
+                if None in node:
+                    token = node[None]
+                    end = j
+            if token is None:
+                if not skip_unknown:
+                    raise ParsingException("unknown token", input_str, i)
+                end = i + 1
+            yield token, i, end
+            i = end
 
-        return out
+    def stream(self, source, chunk_size=1 << 16):
+        '''
+        yield the tokens of @source, a file-like object or an iterable of strings, reading it one chunk at a time.
+        only the chunk being tokenized, plus a token cut at its end, is held in memory.
+        '''
+        chunks = read_chunks(source, chunk_size)
+        buf = ''
+        i = 0
+        eof = False
+        while True:
+            n = len(buf)
+            if i < n and buf[i] in self.whitespace:
+                i += 1
+                continue
+            if i == n:
+                if eof:
+                    return
+                buf, i = next(chunks, None), 0
+                if buf is None:
+                    return
+                continue
+            node = self.trie
+            token = None
+            j = i
+            while j < n:
+                node = node.get(buf[j])
+                if node is None:
+                    break
+                j += 1
+                if None in node:
+                    token = node[None]
+                    end = j
+            if j == n and node is not None and not eof and len(node) > (None in node):
+                # a longer token may continue into the next chunk
+                chunk = next(chunks, None)
+                if chunk is None:
+                    eof = True
+                else:
+                    buf, i = buf[i:] + chunk, 0
+                continue
+            if token is None:
+                raise ParsingException("unknown token", buf, i)
+            yield token
+            i = end
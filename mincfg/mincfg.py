@@ -1,23 +1,137 @@
 
+import collections
+import concurrent.futures
+import functools
+import itertools
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+
 import bnfparser
+from . import earley
 from . import lexer
 
 
+# names of the algorithms a `CFLRecognizer` can decide membership with
+ENGINES = ("cyk", "bitset", "numpy", "valiant", "earley", "parallel", "codegen")
+
+
+class RecognizerCache:
+    '''
+    a bounded cache of `CFLRecognizer`s keyed by (cfgex, lexing, engine), evicting the least recently used.
+    `maxsize` of 0 disables caching.
+    '''
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.recognizers = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def get(self, cfgex, lexing=False, engine="cyk", cache=None):
+        '''
+        get the recognizer of `cfgex`, compiling it on a miss; see `compile` for the arguments.
+        on a hit, the recognizer is still stored into `cache` if it is not there.
+        '''
+        key = (cfgex, bool(lexing), engine)
+        with self.lock:
+            recognizer = self.recognizers.get(key)
+            if recognizer is not None:
+                self.hits += 1
+                self.recognizers.move_to_end(key)
+            else:
+                self.misses += 1
+        if recognizer is not None:
+            if cache is not None:
+                recognizer._store(cfgex, cache)
+            return recognizer
+        # compile outside of the lock; a concurrent miss on the same key merely compiles twice
+        recognizer = CFLRecognizer(cfgex, lexing, engine, cache)
+        with self.lock:
+            self.recognizers[key] = recognizer
+            self.recognizers.move_to_end(key)
+            evicted = self._evict()
+        close_all(evicted)
+        return recognizer
+
+    def resize(self, maxsize):
+        '''
+        change the capacity, evicting the least recently used recognizers that no longer fit.
+        '''
+        with self.lock:
+            self.maxsize = maxsize
+            evicted = self._evict()
+        close_all(evicted)
+
+    def clear(self):
+        '''
+        drop all recognizers, closing them; the counters are kept.
+        '''
+        with self.lock:
+            evicted = list(self.recognizers.values())
+            self.recognizers.clear()
+        close_all(evicted)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def info(self):
+        '''
+        get the counters, the current size and the capacity as a dict.
+        '''
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.recognizers),
+            "maxsize": self.maxsize,
+        }
+
+    def _evict(self):
+        # closing may wait for processes to exit, so the caller does it outside of the lock
+        evicted = []
+        while len(self.recognizers) > max(self.maxsize, 0):
+            evicted.append(self.recognizers.popitem(last=False)[1])
+            self.evictions += 1
+        return evicted
+
+
+def close_all(recognizers):
+    for recognizer in recognizers:
+        recognizer.close()
+
+
+# the recognizers shared by `match` and `compile`
+recognizer_cache = RecognizerCache()
+
+
 def match(cfgex, string, lexing=False):
     '''
     given a Context-Free Grammar expression `cfgex`, decide whether `string` can be produced by it.
     `lexing` if True, will preserve long terminals.
+    the compiled grammar is kept in `recognizer_cache` for later calls.
     '''
     recognizer = compile(cfgex, lexing)
     return recognizer.match(string)
 
 
-def compile(cfgex, lexing=False):
+def compile(cfgex, lexing=False, engine="cyk", cache=None):
     '''
     parse expression `cfgex` and convert the resulted Context-Free Grammar it into Chomsky Normal Form.
     `lexing` if True, will preserve long terminals.
+    `engine` is one of `ENGINES`; "numpy" and "valiant" require NumPy.
+    "parallel" splits the chart of long inputs among processes; see `parallel.parallel_chart`.
+    "codegen" generates Python code for the grammar (see `codegen.generate_source`), also kept in `cache`.
+    "earley" works on the grammar as parsed, and never converts it into Chomsky Normal Form.
+    `cache`, if given, is a `cache.GrammarCache` to load the compiled grammar from, or store it into.
+    the result is shared through `recognizer_cache`; construct a `CFLRecognizer` to get a private one.
     '''
-    return CFLRecognizer(cfgex, lexing)
+    return recognizer_cache.get(cfgex, lexing, engine, cache)
 
 
 def parse(cfgex, lexing=False):
@@ -54,18 +168,58 @@ def eliminate_long_rules(G):
     return G_out
 
 
+def accepts_empty(G):
+    '''
+    decide if the starting -1 of CFG `G` may derive empty string ''
+    '''
+    return -1 in reverse_closure_e(G)
+
+
+def single_terminals(G):
+    '''
+    get the set of terminals that the starting -1 of CFG `G` may derive alone.
+    '''
+    G = minimize_rules_1(G)
+    G = eliminate_long_rules(G)
+    G = eliminate_e_rules(G)
+    return {s for s in closure_s(G, -1) if type(s) is str}
+
+
+def short_rule_index(G):
+    '''
+    index the short rules A -> B of CFG `G` both ways:
+        children[A] is the set of all B such that A -> B
+        parents[B] is the set of all A such that A -> B
+    '''
+    children = {}
+    parents = {}
+    for nt, subs in G:
+        if len(subs) == 1:
+            children.setdefault(nt, set()).add(subs[0])
+            parents.setdefault(subs[0], set()).add(nt)
+    return children, parents
+
+
+def reachable(edges, s):
+    '''
+    get the set of symbols reachable from symbol `s` in graph `edges`, including `s` itself.
+    '''
+    d = {s}
+    stack = [s]
+    while stack:
+        for s2 in edges.get(stack.pop(), ()):
+            if s2 not in d:
+                d.add(s2)
+                stack.append(s2)
+    return d
+
+
 def reverse_closure(G, s):
     '''
     get the set of nonterminals that may derive symbol `s` via some short rules
     '''
-    nt_s = {s}
-    done = False
-    while not done:
-        done = True
-        for nt, subs in G:
-            if len(subs) == 1 and subs[0] in nt_s and nt not in nt_s:
-                nt_s.add(nt)
-                done = False
+    _, parents = short_rule_index(G)
+    nt_s = reachable(parents, s)
     nt_s.remove(s)
     return nt_s
 
@@ -74,15 +228,30 @@ def reverse_closure_e(G):
     '''
     get the set of nonterminals that may derive empty string ''
     '''
-    nt_s = {''}
-    done = False
-    while not done:
-        done = True
-        for nt, subs in G:
-            if all([s in nt_s for s in subs]) and nt not in nt_s:
-                nt_s.add(nt)
-                done = False
-    nt_s.remove('')
+    # remaining[r] is the number of symbols of rule r not yet known to derive ''
+    remaining = []
+    users = {}  # key: symbol; value: the rules it appears in, once per appearance
+    stack = []
+    for r, (nt, subs) in enumerate(G):
+        count = 0
+        for s in subs:
+            if s != '':
+                count += 1
+                users.setdefault(s, []).append(r)
+        remaining.append(count)
+        if count == 0:
+            stack.append(nt)
+
+    nt_s = set()
+    while stack:
+        nt = stack.pop()
+        if nt in nt_s:
+            continue
+        nt_s.add(nt)
+        for r in users.get(nt, ()):
+            remaining[r] -= 1
+            if remaining[r] == 0:
+                stack.append(G[r][0])
     return nt_s
 
 
@@ -112,17 +281,10 @@ def closure_s(G, s):
     '''
     get the set of symbols that may be derived from non-terminal `s` by some short rule.
     '''
-    d = {s}
     if type(s) is str:
-        return d
-    done = False
-    while not done:
-        done = True
-        for nt, subs in G:
-            if len(subs) == 1 and nt in d and subs[0] not in d:
-                d.add(subs[0])
-                done = False
-    return d
+        return {s}
+    children, _ = short_rule_index(G)
+    return reachable(children, s)
 
 
 def eliminate_short_rules(G):
@@ -133,24 +295,27 @@ def eliminate_short_rules(G):
     assuming starting non-terminal is -1.
     '''
     grammar = []
+    children, _ = short_rule_index(G)
     d_s = {}  # key: symbol; value: its short-rule closures
-    d_s[0] = closure_s(G, -1)
+    d_s[0] = reachable(children, -1)
     for nt, subs in G:
         if len(subs) == 2:
             a, b = subs
             if a not in d_s:
-                d_s[a] = closure_s(G, a)
+                d_s[a] = reachable(children, a)
             if b not in d_s:
-                d_s[b] = closure_s(G, b)
+                d_s[b] = reachable(children, b)
             for a_ in d_s[a]:
                 for b_ in d_s[b]:
                     grammar.append((nt, [a_, b_]))
 
+    by_head = {}
+    for nt, subs in grammar:
+        by_head.setdefault(nt, []).append(subs)
     grammar_extra = []
     for a in d_s[0] - {-1}:
-        for nt, subs in grammar:
-            if nt == a and len(subs) == 2:
-                grammar_extra.append((-1, subs))
+        for subs in by_head.get(a, ()):
+            grammar_extra.append((-1, subs))
     grammar = grammar + grammar_extra
 
     return grammar
@@ -165,14 +330,12 @@ def minimize_rules_1(G):
 
     # remove duplicated rules
     G2 = []
-    for rule1 in G:
-        duplicated = False
-        for rule2 in G2:
-            if rule1[0] == rule2[0] and rule1[1] == rule2[1]:
-                duplicated = True
-                break
-        if not duplicated:
-            G2.append(rule1)
+    seen = set()
+    for rule in G:
+        key = (rule[0], tuple(rule[1]))
+        if key not in seen:
+            seen.add(key)
+            G2.append(rule)
     G = G2
 
     # remove self-produced rule
@@ -236,122 +399,1032 @@ def minimize_rules_3(G):
     Assuming there are short rules.
     '''
 
-    nt_s = set(nt for nt, _ in G)
-    done = False
-    while not done:
-        done = True
-        for nt in nt_s:
-            nt0 = None
-            by_short_rule_count = 0
-            for nt2, sub in G:
-                if len(sub) > 1 and nt in sub:
-                    by_short_rule_count = -1
-                    break
-                if len(sub) == 1 and sub[0] == nt:
-                    by_short_rule_count += 1
-                    nt0 = nt2
-            if by_short_rule_count == 1:
-                # now we eliminate nt
-                G2 = []
-                for nt2, sub in G:
-                    if len(sub) == 1 and sub[0] == nt:
-                        continue
-                    if nt2 == nt:
-                        # replace it by the non-terminal that produces it
-                        nt2 = nt0
-                    G2.append((nt2, sub))
-                G = G2
-                nt_s.remove(nt)
-                done = False
-                break
+    rules = [[nt, sub] for nt, sub in G]
+    alive = [True] * len(rules)
+    by_head = {}  # key: non-terminal; value: indices of its rules
+    by_short_rule = {}  # key: symbol; value: indices of the short rules producing it
+    in_long_rule = set()  # symbols appearing in some rule of more than one symbol
+    for r, (nt, sub) in enumerate(rules):
+        by_head.setdefault(nt, []).append(r)
+        if len(sub) == 1:
+            by_short_rule.setdefault(sub[0], []).append(r)
+        elif len(sub) > 1:
+            in_long_rule.update(sub)
 
-    return G
+    # eliminating a non-terminal changes no other non-terminal's rule counts, so one pass suffices
+    for nt in list(by_head):
+        if nt == -1 or nt in in_long_rule:
+            continue
+        short_rules = by_short_rule.get(nt, [])
+        if len(short_rules) != 1:
+            continue
+        # now we eliminate nt
+        r = short_rules.pop()
+        alive[r] = False
+        nt0 = rules[r][0]
+        moved = by_head.pop(nt)
+        for r2 in moved:
+            # replace it by the non-terminal that produces it
+            rules[r2][0] = nt0
+        by_head.setdefault(nt0, []).extend(moved)
+
+    return [(nt, sub) for (nt, sub), a in zip(rules, alive) if a]
 
 
-def to_cnf(G):
+# the passes of `to_cnf`, in order
+CNF_PASSES = (
+    minimize_rules_1,
+    minimize_rules_2,
+    eliminate_long_rules,
+    eliminate_e_rules,
+    minimize_rules_3,
+    eliminate_short_rules,
+    minimize_rules_2,
+)
+
+
+def count_non_terminals(G):
+    return len({nt for nt, _ in G} | {s for _, subs in G for s in subs if type(s) is int})
+
+
+def to_cnf(G, profile=None):
     '''
     convert CFG `G` to Chomsky Normal Form.
+    `profile`, if given, is a list to append a record of every pass to, as a dict of
+    its "pass" name and the "rules", "non_terminals" and "seconds" after it.
     '''
+    for cnf_pass in CNF_PASSES:
+        if profile is None:
+            G = cnf_pass(G)
+            continue
+        start = time.perf_counter()
+        G = cnf_pass(G)
+        seconds = time.perf_counter() - start
+        profile.append({
+            "pass": cnf_pass.__name__,
+            "rules": len(G),
+            "non_terminals": count_non_terminals(G),
+            "seconds": seconds,
+        })
+    return G
 
-    # print(f"before minimize, n = {len(G)}")
-    G = minimize_rules_1(G)
-    G = minimize_rules_2(G)
-    # print(f"after minimize, n = {len(G)}")
 
-    G = eliminate_long_rules(G)
+def long_rule_origins(G):
+    '''
+    map every non-terminal `eliminate_long_rules` introduces while `to_cnf` converts CFG `G`
+    to the non-terminal of `G` whose long rule it breaks down.
+    '''
+    G = minimize_rules_2(minimize_rules_1(G))
+    lowest = get_min_non_terminal(G)
+    origins = {}
+    # a rule mentions its new non-terminal before the rules of the latter
+    for nt, subs in eliminate_long_rules(G):
+        if len(subs) == 2 and type(subs[1]) is int and subs[1] < lowest and subs[1] not in origins:
+            origins[subs[1]] = origins.get(nt, nt)
+    return origins
 
-    G = eliminate_e_rules(G)
 
-    # print(f"before minimize, n = {len(G)}")
-    G = minimize_rules_3(G)
-    # print(f"after minimize, n = {len(G)}")
+def profile_cnf(G, top=10):
+    '''
+    convert CFG `G` to Chomsky Normal Form, and report where its rules come from, as (G_cnf, passes, sources):
+        passes is the `profile` of `to_cnf`, preceded by a record of `G` itself named "input"
+        sources lists the `top` non-terminals of `G` heading the most rules of G_cnf, as (non-terminal, count)
+    the rules of non-terminals introduced by `eliminate_long_rules` count for their origin (see `long_rule_origins`).
+    '''
+    passes = [{"pass": "input", "rules": len(G), "non_terminals": count_non_terminals(G), "seconds": 0.0}]
+    G_cnf = to_cnf(G, passes)
+    origins = long_rule_origins(G) if G_cnf else {}
+    counts = collections.Counter(origins.get(nt, nt) for nt, _ in G_cnf)
+    return G_cnf, passes, counts.most_common(top)
 
-    G = eliminate_short_rules(G)
 
-    # print(f"before minimize, n = {len(G)}")
-    G = minimize_rules_2(G)
-    # print(f"after minimize, n = {len(G)}")
+def index_rules(G):
+    '''
+    index the rules of CFG `G` in CNF by their right-hand side:
+        index[B][C] is the set of all A such that A -> B C
+    '''
+    index = {}
+    for a, (b, c) in G:
+        index.setdefault(b, {}).setdefault(c, set()).add(a)
+    return index
 
-    return G
 
+def terminal_sets(G, side):
+    '''
+    for CFG `G` in CNF, map every symbol to the set of terminals that the strings it derives may
+    begin with (`side` 0) or end with (`side` 1).
+    '''
+    sets = {}
+    parents = {}  # key: symbol; value: the non-terminals having it on `side` of some rule
+    stack = []
+    for a, subs in G:
+        parents.setdefault(subs[side], set()).add(a)
+        for b in subs:
+            if type(b) is str and b not in sets:
+                sets[b] = {b}
+                stack.append(b)
+    while stack:
+        b = stack.pop()
+        for a in parents.get(b, ()):
+            t = sets.setdefault(a, set())
+            if not sets[b] <= t:
+                t |= sets[b]
+                stack.append(a)
+    return sets
 
-def decide(G, x):
+
+def terminal_bounds(G):
     '''
-    given CFG `G` in CNF, decide if string `x` is in L(G).
+    for CFG `G` in CNF, get (first, last, follow) of the strings the starting -1 derives:
+        first is the set of terminals they may begin with, and last the set they may end with
+        follow[a] is the set of terminals that may come right after terminal a
+    only rules reachable from -1 are considered.
+    '''
+    children = {}
+    for a, (b, c) in G:
+        children.setdefault(a, set()).update((b, c))
+    useful = reachable(children, -1)
+    G = [(a, subs) for a, subs in G if a in useful]
+
+    first = terminal_sets(G, 0)
+    last = terminal_sets(G, 1)
+    follow = {}
+    for a, (b, c) in G:
+        for t in last.get(b, ()):
+            follow.setdefault(t, set()).update(first.get(c, ()))
+    return first.get(-1, set()), last.get(-1, set()), follow
+
+
+def chart_rows(n):
+    '''
+    a chart for a string of length `n` only has the cells (i, j) with i <= j, stored span-major in a flat list:
+        the cell of substring x[i:j+1] is chart[rows[j - i] + i]
+    so all spans of the same length are adjacent, and the whole string is the last cell.
+    return `rows`.
+    '''
+    return [s * n - s * (s - 1) // 2 for s in range(n)]
+
+
+def chart_memory(chart):
+    '''
+    get the number of bytes held by `chart` and its cells.
+    '''
+    size = sys.getsizeof(chart)
+    seen = set()
+    for cell in chart:
+        if id(cell) not in seen:
+            seen.add(id(cell))
+            size += sys.getsizeof(cell)
+    return size
+
+
+def stops_chart(length, empty_since):
+    '''
+    decide if no span longer than `length` can be derived, given that no span of
+    any length between `empty_since` and `length` can be derived.
+    every binary derivation tree of more than `length` leaves has a subtree of
+    between `empty_since` and 2 * `empty_since` - 2 leaves: descend into the larger child until the size drops below `empty_since`.
+    '''
+    return length >= 2 * empty_since - 2
+
+
+def cyk_chart(G, x, index=None, counters=None, max_length=None):
+    '''
+    fill the CYK chart of CFG `G` in CNF on string `x`; see `chart_rows` for its layout.
+    every cell is the set of all symbols that can derive the substring.
+    `index`, if given, is the result of `index_rules(G)`.
+    the fill stops early once `stops_chart`, counting "empty_diagonal" in dict `counters` if given.
+    if `max_length` is given, only the rows of substrings up to that length are filled and kept.
+    '''
+    return fill_chart(G, x, cyk_cell, index, counters, max_length)
+
+
+def fill_chart(G, x, cell_of, index=None, counters=None, max_length=None):
+    '''
+    the fill of `cyk_chart`, computing every cell of two symbols or more by `cell_of(N, rows, index, i, s)`,
+    such as `cyk_cell`.
     '''
     n = len(x)
-    if n < 2:
-        raise Exception("string must be at least two-character-long")
+    if index is None:
+        index = index_rules(G)
+    L = n if max_length is None else max(0, min(max_length, n))
 
-    # N[i][j] is the set of all symbols that can derive substring x[i:j+1]
-    N = [[set() for _ in range(n)] for _ in range(n)]
+    rows = chart_rows(n)
+    # cells nothing derives all share one empty set
+    empty = frozenset()
+    N = [empty] * (rows[L - 1] + n - L + 1 if L else n)
 
     # initialize N
     for i in range(n):
-        N[i][i] = {x[i]}
+        N[i] = {x[i]}
+
+    # all spans of length empty_since and longer so far are underivable
+    empty_since = None
 
     # dynamic programming loop
-    for s in range(1, n):
+    for s in range(1, L):
         # s = the length of the substring - 1
+        filled = False
         for i in range(n - s):
             # i is the starting index of the substring
             # (i + s) is the ending index of the substring
-            for k in range(i, i + s):
-                # substring is divided by two halves: first half + second half
-                # k is the ending index of the first half
-                for a, (b, c) in G:
-                    if b in N[i][k] and c in N[k + 1][i + s]:
-                        N[i][i + s].add(a)
+            cell = cell_of(N, rows, index, i, s)
+            if cell:
+                N[rows[s] + i] = cell
+                filled = True
+        if filled:
+            empty_since = None
+        else:
+            if empty_since is None:
+                empty_since = s + 1
+            if s + 1 < n and stops_chart(s + 1, empty_since):
+                if counters is not None:
+                    counters["empty_diagonal"] += 1
+                break
+
+    return N
+
 
+def cyk_cell(N, rows, index, i, s):
+    '''
+    compute the cell of chart `N` for the substring of length s + 1 starting at i, given the cells of
+    all shorter substrings; `rows` and `index` are as in `cyk_chart`.
+    '''
+    cell = set()
+    for k in range(i, i + s):
+        # substring is divided by two halves: first half + second half
+        # k is the ending index of the first half
+        right = N[rows[i + s - k - 1] + k + 1]
+        if not right:
+            continue
+        for b in N[rows[k - i] + i]:
+            row = index.get(b)
+            if row is None:
+                continue
+            # only look at the pairs (b, c) that are present on both sides
+            if len(row) < len(right):
+                for c, heads in row.items():
+                    if c in right:
+                        cell |= heads
+            else:
+                for c in right:
+                    heads = row.get(c)
+                    if heads is not None:
+                        cell |= heads
+    return cell
+
+
+def cyk_cell_stats(N, rows, index, i, s, stats):
+    '''
+    same as `cyk_cell`, but also count its work into the counters of `MatchStats` `stats`.
+    '''
+    splits = probes = derivations = 0
+    cell = set()
+    for k in range(i, i + s):
+        splits += 1
+        right = N[rows[i + s - k - 1] + k + 1]
+        if not right:
+            continue
+        for b in N[rows[k - i] + i]:
+            row = index.get(b)
+            probes += 1
+            if row is None:
+                continue
+            if len(row) < len(right):
+                probes += len(row)
+                for c, heads in row.items():
+                    if c in right:
+                        derivations += len(heads)
+                        cell |= heads
+            else:
+                probes += len(right)
+                for c in right:
+                    heads = row.get(c)
+                    if heads is not None:
+                        derivations += len(heads)
+                        cell |= heads
+    stats.cells += 1
+    stats.splits += splits
+    stats.probes += probes
+    stats.derivations += derivations
+    return cell
+
+
+def cyk_chart_stats(G, x, stats, index=None, counters=None):
+    '''
+    same as `cyk_chart`, but also count its work into `MatchStats` `stats`, by `cyk_cell_stats`.
+    '''
+    if counters is None:
+        counters = {"empty_diagonal": 0}
+    empty_diagonal = counters["empty_diagonal"]
+    stats.cells = stats.splits = stats.probes = stats.derivations = 0
+    N = fill_chart(G, x, functools.partial(cyk_cell_stats, stats=stats), index, counters)
+    if counters["empty_diagonal"] != empty_diagonal:
+        stats.shortcut = "empty_diagonal"
+    stats.peak_cell = max(map(len, N), default=0)
+    return N
+
+
+def decide(G, x, index=None):
+    '''
+    given CFG `G` in CNF, decide if string `x` is in L(G).
+    `index`, if given, is the result of `index_rules(G)`.
+    '''
+    # every rule of `G` is binary, so it derives no string shorter than two
+    if len(x) < 2:
+        return False
     # assume starting state is -1
-    return -1 in N[0][n - 1]
+    return -1 in cyk_chart(G, x, index)[-1]
+
+
+def intern_symbols(G):
+    '''
+    number every symbol of CFG `G` in CNF by a dense integer id, in order of first appearance.
+    the starting -1 is always numbered 0.
+    '''
+    ids = {-1: 0}
+    for a, (b, c) in G:
+        for s in (a, b, c):
+            if s not in ids:
+                ids[s] = len(ids)
+    return ids
+
+
+def index_rules_bitset(G, ids):
+    '''
+    index the rules of CFG `G` in CNF over the symbol ids `ids` from `intern_symbols(G)`:
+        index[b] is None if no rule has b on the left, otherwise (mask, pairs), where
+        mask has the bit of every c such that some A -> b c, and
+        pairs is a list of (bit of c, mask of all A such that A -> b c)
+    '''
+    by_left = [{} for _ in range(len(ids))]
+    for a, (b, c) in G:
+        row = by_left[ids[b]]
+        c_bit = 1 << ids[c]
+        row[c_bit] = row.get(c_bit, 0) | (1 << ids[a])
+    index = []
+    for row in by_left:
+        if row:
+            mask = 0
+            for c_bit in row:
+                mask |= c_bit
+            index.append((mask, list(row.items())))
+        else:
+            index.append(None)
+    return index
+
+
+def bitset_chart(G, x, ids=None, index=None, counters=None):
+    '''
+    same as `cyk_chart`, but every cell is a bitset (a Python int) over the symbol ids of `G`.
+    `ids` and `index`, if given, are the results of `intern_symbols(G)` and `index_rules_bitset(G, ids)`.
+    '''
+    n = len(x)
+    if ids is None:
+        ids = intern_symbols(G)
+    if index is None:
+        index = index_rules_bitset(G, ids)
+
+    rows = chart_rows(n)
+    N = [0] * (n * (n + 1) // 2)
+
+    for i in range(n):
+        if x[i] in ids:
+            N[i] = 1 << ids[x[i]]
+
+    empty_since = None
+    for s in range(1, n):
+        filled = False
+        for i in range(n - s):
+            cell = 0
+            for k in range(i, i + s):
+                left = N[rows[k - i] + i]
+                right = N[rows[i + s - k - 1] + k + 1]
+                if not left or not right:
+                    continue
+                # visit every bit b of left
+                while left:
+                    low = left & -left
+                    left ^= low
+                    entry = index[low.bit_length() - 1]
+                    if entry is None or not entry[0] & right:
+                        continue
+                    for c_bit, heads in entry[1]:
+                        if right & c_bit:
+                            cell |= heads
+            if cell:
+                N[rows[s] + i] = cell
+                filled = True
+        if filled:
+            empty_since = None
+        else:
+            if empty_since is None:
+                empty_since = s + 1
+            if s + 1 < n and stops_chart(s + 1, empty_since):
+                if counters is not None:
+                    counters["empty_diagonal"] += 1
+                break
+
+    return N
+
+
+def decide_bitset(G, x, ids=None, index=None):
+    '''
+    same as `decide`, but runs on `bitset_chart`.
+    '''
+    if len(x) < 2:
+        return False
+    # the starting -1 is numbered 0
+    return bitset_chart(G, x, ids, index)[-1] & 1 == 1
+
+
+# the recognizer of a `CFLRecognizer.match_many` worker process
+_worker_recognizer = None
+
+
+def _init_worker(recognizer):
+    global _worker_recognizer
+    _worker_recognizer = recognizer
+
+
+def _match_chunk(strings, errors):
+    if errors:
+        return [_match_or_error(_worker_recognizer, string) for string in strings]
+    return [_worker_recognizer.match(string) for string in strings]
+
+
+def _match_or_error(recognizer, string):
+    try:
+        return recognizer.match(string)
+    except Exception as e:
+        # the message rather than the exception, which may not survive pickling
+        return str(e).strip() or type(e).__name__
+
+
+class MatchStats:
+    '''
+    what one instrumented `CFLRecognizer.match` did; true if the string matched.
+        length: number of symbols after lexing
+        lexing_seconds, fill_seconds: time spent lexing, and deciding from the symbols
+        shortcut: the name of the shortcut that rejected the string (see `CFLRecognizer.shortcuts`), or None
+    with the "cyk" engine, the chart fill is counted (see `cyk_chart_stats`); these stay None otherwise:
+        cells: cells of two symbols or more visited
+        splits: (i, k) split points tried
+        probes: lookups of a symbol or a pair of symbols in `index_rules`
+        derivations: (cell, rule) pairs found
+        peak_cell: the most symbols in one cell
+    '''
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.matched = False
+        self.length = 0
+        self.lexing_seconds = 0.0
+        self.fill_seconds = 0.0
+        self.shortcut = None
+        self.cells = None
+        self.splits = None
+        self.probes = None
+        self.derivations = None
+        self.peak_cell = None
+
+    def __bool__(self):
+        return self.matched
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"MatchStats({fields})"
 
 
 class CFLRecognizer:
 
-    def __init__(self, cfgex, lexing):
+    def __init__(self, cfgex, lexing, engine="cyk", cache=None):
+        if engine not in ENGINES:
+            raise Exception(f"unknown engine: {engine}")
+        entry = cache.load(cfgex, lexing) if cache is not None else None
+        if entry is not None:
+            grammar, grammar_cnf = entry
+        else:
+            grammar = parse(cfgex, lexing)
+            grammar_cnf = None
+        self._setup(grammar, grammar_cnf, lexing, engine)
+        if cache is not None:
+            if engine == "codegen":
+                self._code = cache.load_code(cfgex, lexing)
+            self._store(cfgex, cache)
+
+    def _store(self, cfgex, cache):
+        '''
+        store the compiled grammar of `cfgex`, and the code of the "codegen" engine, into `cache` unless there already.
+        '''
+        if not os.path.exists(cache.path(cfgex, self.lexing)):
+            cache.store(cfgex, self.lexing, self.grammar, self.grammar_cnf)
+        if self.engine == "codegen" and not os.path.exists(cache.code_path(cfgex, self.lexing)):
+            cache.store_code(cfgex, self.lexing, self.code)
+
+    @classmethod
+    def load(cls, path, engine="cyk"):
+        '''
+        get a recognizer of the grammar saved at `path` by `save`, mapping the file into memory (see `binary.load`).
+        the file holds the grammar in Chomsky Normal Form only, so `grammar` is that grammar plus the rules
+        -1 -> '' and -1 -> t for the answers on strings shorter than two.
+        '''
+        if engine not in ENGINES:
+            raise Exception(f"unknown engine: {engine}")
+        from . import binary
+        compiled = binary.load(path)
+        grammar_cnf = compiled.rules()
+        grammar = list(grammar_cnf)
+        if compiled.accepts_empty:
+            grammar.append((-1, ['']))
+        grammar.extend((-1, [t]) for t in compiled.singles())
+        recognizer = cls.__new__(cls)
+        recognizer._setup(grammar, grammar_cnf, compiled.lexing, engine)
+        return recognizer
+
+    def save(self, path):
+        '''
+        write the grammar in Chomsky Normal Form to `path` in the format of `binary.dump`.
+        '''
+        from . import binary
+        binary.dump(path, self.grammar_cnf, self.lexing, self.accepts_empty, self.single_terminals)
+
+    def _setup(self, grammar, grammar_cnf, lexing, engine):
         self.lexing = lexing
-        self.grammar = parse(cfgex, lexing)
-        self.grammar_cnf = to_cnf(self.grammar)
+        self.engine = engine
+        # number of bytes held by the chart of the last match
+        self.chart_bytes = 0
+        # number of processes of the "parallel" engine; None for one per core
+        self.workers = None
+        # if set, called with the `MatchStats` of every match
+        self.stats_callback = None
+        self._rule_index = None
+        self._lexer = None
+        self._generator = None
+        self._unit_children = None
+        self._unfolded = None
+        self._code = None
+        self._fill = None
+        # the `parallel.ChartPool` of the "parallel" engine, started on the first long input
+        self._pool = None
+        self.grammar = grammar
+        self._grammar_cnf = grammar_cnf
+        # the answers for strings shorter than two
+        self.accepts_empty = accepts_empty(self.grammar)
+        self.single_terminals = single_terminals(self.grammar)
+        self._bounds = None
+        # how many times each shortcut rejected a string without a full chart:
+        #   "first", "last", "follow": by `terminal_bounds`, before the chart
+        #   "empty_diagonal": by `stops_chart`, while filling the chart
+        self.shortcuts = {"first": 0, "last": 0,
+                          "follow": 0, "empty_diagonal": 0}
+        # for the "earley" engine and `match_stream`
+        self.earley_rules = earley.index_rules(self.grammar)
+        self.nullable = reverse_closure_e(self.grammar)
+        if engine == "codegen":
+            self.symbol_ids = intern_symbols(self.grammar_cnf)
+        elif engine in ("bitset", "parallel"):
+            self.symbol_ids = intern_symbols(self.grammar_cnf)
+            self.bitset_index = index_rules_bitset(
+                self.grammar_cnf, self.symbol_ids)
+        elif engine in ("numpy", "valiant"):
+            from . import vectorized
+            self.symbol_ids = intern_symbols(self.grammar_cnf)
+            self.rule_table = vectorized.rule_table(
+                self.grammar_cnf, self.symbol_ids)
+
+    @property
+    def grammar_cnf(self):
+        '''
+        the grammar in Chomsky Normal Form, converted on first use.
+        '''
+        if self._grammar_cnf is None:
+            self._grammar_cnf = to_cnf(self.grammar)
+        return self._grammar_cnf
+
+    @property
+    def rule_index(self):
+        '''
+        the result of `index_rules(self.grammar_cnf)`, built on first use.
+        '''
+        if self._rule_index is None:
+            self._rule_index = index_rules(self.grammar_cnf)
+        return self._rule_index
+
+    @property
+    def code(self):
+        '''
+        the code object of `codegen.generate_source` for `self.grammar_cnf`, generated on first use.
+        '''
+        if self._code is None:
+            from . import codegen
+            source = codegen.generate_source(self.grammar_cnf, self.symbol_ids)
+            self._code = codegen.compile_source(source)
+        return self._code
+
+    def close(self):
+        '''
+        shut down the process pool of the "parallel" engine, if started; a later match starts another.
+        '''
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        # functions, code objects and process pools do not pickle, but code objects marshal
+        state = self.__dict__.copy()
+        state["_fill"] = None
+        state["_pool"] = None
+        if self._code is not None:
+            state["_code"] = marshal.dumps(self._code)
+        return state
+
+    def __setstate__(self, state):
+        if state["_code"] is not None:
+            state["_code"] = marshal.loads(state["_code"])
+        self.__dict__.update(state)
+
+    @property
+    def bounds(self):
+        '''
+        the result of `terminal_bounds(self.grammar_cnf)`, computed on first use.
+        '''
+        if self._bounds is None:
+            self._bounds = terminal_bounds(self.grammar_cnf)
+        return self._bounds
+
+    @property
+    def lexer(self):
+        '''
+        the `lexer.Lexer` over the terminals of the grammar, and those the starting -1 derives alone, built on first use.
+        '''
+        if self._lexer is None:
+            G = self.grammar if self.engine == "earley" else self.grammar_cnf
+            # the terminals the starting -1 derives alone are in no rule of the CNF
+            self._lexer = lexer.Lexer(lexer.terminals(G) | self.single_terminals)
+        return self._lexer
+
+    @property
+    def generator(self):
+        '''
+        the `generate.SentenceGenerator` of `self.grammar_cnf`, built on first use.
+        '''
+        if self._generator is None:
+            from . import generate
+            self._generator = generate.SentenceGenerator(
+                self.grammar_cnf, 0, self.accepts_empty, self.single_terminals)
+        return self._generator
+
+    def generate(self, length, rng=random, near_miss=False, attempts=100):
+        '''
+        sample a string of `length` symbols, tokens if lexing, uniformly among all derivation trees of that length,
+        drawing from `rng`; get None if the grammar produces no string of that length.
+        if `near_miss`, the string is instead edited once (see `generate.mutate`) until it no longer matches;
+        get None if `attempts` edits all still match.
+        '''
+        x = self.generator.sample(length, rng)
+        if x is not None and near_miss:
+            from . import generate
+            alphabet = sorted(lexer.terminals(self.grammar_cnf) | self.single_terminals)
+            for _ in range(attempts):
+                y = generate.mutate(x, alphabet, rng)
+                if not self._match_symbols(y):
+                    x = y
+                    break
+            else:
+                x = None
+        if x is None:
+            return None
+        return " ".join(x) if self.lexing else "".join(x)
+
+    def match(self, string, stats=False):
+        '''
+        decide whether `string` can be produced by the grammar.
+        if `stats` is True, get a `MatchStats` instead, which is true if it can.
+        the match is only instrumented if `stats` is True or `stats_callback` is set.
+        '''
+        if stats or self.stats_callback is not None:
+            result = self._match_stats(string)
+            if self.stats_callback is not None:
+                self.stats_callback(result)
+            return result if stats else result.matched
+
+        if self.lexing:
+            string = self.lexer.analyze(string)
+        return self._match_symbols(string)
+
+    def _match_symbols(self, x):
+        if len(x) == 0:
+            return self.accepts_empty
+        elif len(x) == 1:
+            return x[0] in self.single_terminals
+        if self.engine != "earley" and self._prefilter(x) is not None:
+            return False
+        return self._decide(x)
+
+    def _match_stats(self, string):
+        stats = MatchStats(self.engine)
+        start = time.perf_counter()
+        if self.lexing:
+            string = self.lexer.analyze(string)
+        stats.length = len(string)
+        stats.lexing_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if len(string) < 2:
+            stats.matched = self._match_symbols(string)
+        else:
+            if self.engine != "earley":
+                stats.shortcut = self._prefilter(string)
+            if stats.shortcut is not None:
+                stats.matched = False
+            elif self.engine == "cyk":
+                chart = cyk_chart_stats(self.grammar_cnf, string, stats,
+                                        self.rule_index, self.shortcuts)
+                self.chart_bytes = chart_memory(chart)
+                stats.matched = -1 in chart[-1]
+            else:
+                empty_diagonal = self.shortcuts["empty_diagonal"]
+                stats.matched = self._decide(string)
+                if self.shortcuts["empty_diagonal"] != empty_diagonal:
+                    stats.shortcut = "empty_diagonal"
+        stats.fill_seconds = time.perf_counter() - start
+        return stats
 
-    def match(self, string):
+    def forest(self, string):
+        '''
+        parse `string` into a `forest.ParseForest` of all its derivation trees, or None if it is not matched.
+        the chart records back-pointers as it is filled, whatever the engine.
+        '''
+        from . import forest
+        if self.lexing:
+            string = self.lexer.analyze(string)
+
+        # the trees of strings shorter than two have no node from eliminate_long_rules
         if len(string) == 0:
-            return self._match_len0()
+            if not self.accepts_empty:
+                return None
+            return forest.ParseForest(string, {(-1, 0, 0): [()]}, -1)
         elif len(string) == 1:
-            return self._match_len1(string[0])
+            if string[0] not in self.single_terminals:
+                return None
+            return forest.ParseForest(string, {(-1, 0, 1): [((string[0], 0, 1),)]}, -1)
+
+        chart = forest.forest_chart(self.grammar_cnf, string, self.rule_index)
+        if -1 not in chart[-1]:
+            return None
+        # the non-terminals eliminate_long_rules introduces are numbered below all others
+        lowest = get_min_non_terminal(minimize_rules_2(minimize_rules_1(self.grammar)))
+        return forest.ParseForest.from_chart(string, chart, lowest)
+
+    def finditer(self, text, symbol=-1, max_length=None, overlapping=False):
+        '''
+        iterate over the (start, end) offsets of the substrings text[start:end] that non-terminal `symbol` derives,
+        from one chart fill over `text`; in lexing mode the substrings are of whole tokens, leaving out the
+        whitespace around them, and every character that starts no token separates runs of tokens searched
+        apart, one chart fill each. empty substrings are never reported.
+        `max_length`, if given, bounds their length in symbols, and the fill to O(n * max_length^2).
+        by default the matches do not overlap: from left to right, the longest one starting at each offset
+        is taken; if `overlapping`, all of them are, by start then end.
+        `symbol` is a number of a non-terminal of `grammar`; one that derives no non-empty string never matches.
+        '''
+        search = self._unit_closure(symbol)
+        if not search[0]:
+            return
+        if not self.lexing:
+            yield from self._find_run(text, range(len(text)), range(1, len(text) + 1),
+                                      search, max_length, overlapping)
+            return
+        run = []
+        for token in self.lexer.tokenize(text, skip_unknown=True):
+            if token[0] is not None:
+                run.append(token)
+            elif run:
+                yield from self._find_tokens(run, search, max_length, overlapping)
+                run = []
+        if run:
+            yield from self._find_tokens(run, search, max_length, overlapping)
+
+    def _find_tokens(self, tokens, search, max_length, overlapping):
+        x = [token for token, _, _ in tokens]
+        starts = [start for _, start, _ in tokens]
+        ends = [end for _, _, end in tokens]
+        return self._find_run(x, starts, ends, search, max_length, overlapping)
+
+    def _find_run(self, x, starts, ends, search, max_length, overlapping):
+        '''
+        iterate over the (starts[i], ends[j]) of the substrings x[i:j + 1] of symbols that one of the targets derives,
+        where `search` is (targets, grammar in CNF, rule index) from `_unit_closure`; see `finditer`.
+        '''
+        targets, G, index = search
+        n = len(x)
+        L = n if max_length is None else min(max_length, n)
+        chart = cyk_chart(G, x, index, max_length=L)
+        rows = chart_rows(n)
+
+        i = 0
+        while i < n:
+            lengths = range(1, min(L, n - i) + 1)
+            if not overlapping:
+                lengths = reversed(lengths)
+            found = 0
+            for l in lengths:
+                if not targets.isdisjoint(chart[rows[l - 1] + i]):
+                    yield starts[i], ends[i + l - 1]
+                    found = l
+                    if not overlapping:
+                        break
+            i += found if found and not overlapping else 1
 
+    def _unit_closure(self, symbol):
+        '''
+        get (targets, G, index): the grammar in CNF and its rule index to fill the chart with, and the set of symbols
+        of the cells of which `symbol` derives the substring.
+        the conversion into CNF folds short rules A -> B into the rules using A, so these are all the symbols
+        `symbol` derives by short rules, as the grammar stands just before `eliminate_short_rules`.
+        a non-terminal `minimize_rules_3` folds away is searched over a CNF converted without that pass,
+        built on first use; one that derives no non-empty string is in neither, and gets no targets.
+        '''
+        if self._unit_children is None:
+            G = self.grammar
+            for cnf_pass in CNF_PASSES[:CNF_PASSES.index(eliminate_short_rules)]:
+                G = cnf_pass(G)
+            children, _ = short_rule_index(G)
+            self._unit_children = children, {nt for nt, _ in G}
+        children, heads = self._unit_children
+        if symbol in heads:
+            return reachable(children, symbol), self.grammar_cnf, self.rule_index
+
+        if self._unfolded is None:
+            passes = tuple(cnf_pass for cnf_pass in CNF_PASSES if cnf_pass is not minimize_rules_3)
+            G = self.grammar
+            for cnf_pass in passes[:passes.index(eliminate_short_rules)]:
+                G = cnf_pass(G)
+            unfolded_children, _ = short_rule_index(G)
+            unfolded_heads = {nt for nt, _ in G}
+            for cnf_pass in passes[passes.index(eliminate_short_rules):]:
+                G = cnf_pass(G)
+            self._unfolded = unfolded_children, unfolded_heads, G, index_rules(G)
+        children, heads, G, index = self._unfolded
+        if symbol in heads:
+            return reachable(children, symbol), G, index
+        if symbol not in {nt for nt, _ in self.grammar}:
+            raise Exception(f"{symbol} is not a non-terminal of the grammar")
+        return set(), G, index
+
+    def session(self, text=""):
+        '''
+        start a `session.MatchSession` on `text`, to match it again after every edit.
+        '''
+        from . import session
+        return session.MatchSession(self, text)
+
+    def match_many(self, strings, workers=None, chunksize=64, errors=False):
+        '''
+        same as `match` on every string of iterable `strings`, yielding the results in order.
+        the strings are matched in chunks of `chunksize` by a pool of `workers` processes,
+        by default one per core, and each worker receives the compiled recognizer once.
+        `strings` is read as the results are consumed, a few chunks per worker ahead.
+        `shortcuts` and `chart_bytes` are not updated by the workers.
+        if `errors` is True, a string on which `match` raises yields the message of the exception instead, a str.
+        '''
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            if errors:
+                yield from (_match_or_error(self, string) for string in strings)
+            else:
+                yield from map(self.match, strings)
+            return
+
+        self._prepare()
+        strings = iter(strings)
+        executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self,))
+        try:
+            pending = collections.deque()
+            while True:
+                while len(pending) < 2 * workers:
+                    chunk = list(itertools.islice(strings, chunksize))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_match_chunk, chunk, errors))
+                if not pending:
+                    break
+                yield from pending.popleft().result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _prepare(self):
+        '''
+        build everything `match` builds on first use, so that copies of the recognizer do not build it again.
+        '''
         if self.lexing:
-            string = lexer.lex(self.grammar_cnf, string)
-            print("post lexing:", string)
-        return decide(self.grammar_cnf, string)
-
-    def _match_len0(self):
-        nt_s = reverse_closure_e(self.grammar)
-        return -1 in nt_s
-
-    def _match_len1(self, s):
-        G = minimize_rules_1(self.grammar)
-        G = eliminate_long_rules(G)
-        G = eliminate_e_rules(G)
-        nt_s = reverse_closure(G, s)
-        return -1 in nt_s
+            self.lexer
+        if self.engine != "earley":
+            self.bounds
+        if self.engine == "cyk":
+            self.rule_index
+        if self.engine == "codegen":
+            self.code
+
+    def _prefilter(self, x):
+        '''
+        check `x` against `self.bounds` in linear time.
+        return the name of the shortcut `x` fails, or None if it may still be accepted.
+        '''
+        first, last, follow = self.bounds
+        failed = None
+        if x[0] not in first:
+            failed = "first"
+        elif x[-1] not in last:
+            failed = "last"
+        else:
+            for i in range(len(x) - 1):
+                if x[i + 1] not in follow.get(x[i], ()):
+                    failed = "follow"
+                    break
+        if failed is not None:
+            self.shortcuts[failed] += 1
+        return failed
+
+    def match_stream(self, source, chunk_size=1 << 16):
+        '''
+        same as `match`, but the input is read from `source`, a file-like object or an iterable of strings, as it goes.
+        symbols are fed to an `earley.EarleyRecognizer` one at a time, whatever the engine,
+        and reading stops at the first symbol with which no string of the language can begin the input.
+        '''
+        if self.lexing:
+            symbols = self.lexer.stream(source, chunk_size)
+        else:
+            symbols = (ch for chunk in lexer.read_chunks(source, chunk_size) for ch in chunk)
+        recognizer = earley.EarleyRecognizer(self.earley_rules, self.nullable)
+        for s in symbols:
+            if not recognizer.feed(s):
+                return False
+        return recognizer.accepted
+
+    def _parallel_decide(self, x):
+        '''
+        decide `x` by the pool of the "parallel" engine, reading only the top cell of the chart back,
+        or in this process if `x` is short or there is a single worker.
+        '''
+        from . import parallel
+        workers = self.workers or os.cpu_count() or 1
+        if workers <= 1 or len(x) < parallel.MIN_LENGTH:
+            chart = bitset_chart(self.grammar_cnf, x, self.symbol_ids,
+                                 self.bitset_index, self.shortcuts)
+            self.chart_bytes = chart_memory(chart)
+            return chart[-1] & 1 == 1
+        if self._pool is None or self._pool.workers != workers:
+            if self._pool is not None:
+                self._pool.close()
+            self._pool = parallel.ChartPool(self.bitset_index, workers)
+        top = self._pool.top(x, self.symbol_ids, self.shortcuts)
+        self.chart_bytes = self._pool.chart_bytes
+        return top & 1 == 1
+
+    def _decide(self, x):
+        if self.engine == "earley":
+            return earley.recognize(self.earley_rules, self.nullable, x)
+
+        if self.engine == "numpy":
+            from . import vectorized
+            chart = vectorized.numpy_chart(x, self.symbol_ids, self.rule_table)
+            self.chart_bytes = chart.nbytes
+            # the starting -1 is numbered 0
+            return bool(chart[len(x), 0, 0])
+
+        if self.engine == "valiant":
+            from . import valiant
+            chart = valiant.valiant_chart(x, self.symbol_ids, self.rule_table)
+            self.chart_bytes = chart.nbytes
+            return bool(chart[0, 0, len(x)])
+
+        if self.engine == "codegen":
+            from . import codegen
+            if self._fill is None:
+                self._fill = codegen.load_fill(self.code)
+            chart = codegen.codegen_chart(x, self.symbol_ids, self._fill, self.shortcuts)
+            self.chart_bytes = chart_memory(chart)
+            return chart[-1] & 1 == 1
+
+        if self.engine == "parallel":
+            return self._parallel_decide(x)
+
+        if self.engine == "bitset":
+            chart = bitset_chart(self.grammar_cnf, x, self.symbol_ids,
+                                 self.bitset_index, self.shortcuts)
+            matched = chart[-1] & 1 == 1
+        else:
+            chart = cyk_chart(self.grammar_cnf, x,
+                              self.rule_index, self.shortcuts)
+            matched = -1 in chart[-1]
+        self.chart_bytes = chart_memory(chart)
+        return matched
@@ -0,0 +1,162 @@
+import concurrent.futures
+import os
+from multiprocessing import shared_memory
+
+from .mincfg import bitset_chart, chart_rows, stops_chart
+
+
+# inputs shorter than this are decided by `CFLRecognizer` on a single core, as starting the pool would not pay off
+MIN_LENGTH = 256
+
+# per worker process: the rule index, and (name, shared memory, cell width in bytes, chart_rows(n)) of the chart
+_index = None
+_chart = None
+
+
+def _init_worker(index):
+    global _index
+    _index = index
+
+
+def _attach(name, n, width):
+    '''
+    get the chart in shared memory `name`, attaching it if it is not the chart of the previous call.
+    '''
+    global _chart
+    if _chart is None or _chart[0] != name:
+        if _chart is not None:
+            _chart[1].close()
+        _chart = (name, shared_memory.SharedMemory(name), width, chart_rows(n))
+    return _chart
+
+
+def _fill(name, n, width, s, lo, hi):
+    '''
+    compute the cells of substrings of length s + 1 starting at lo .. hi - 1 of the chart of length `n` in shared memory
+    `name`; return whether any is non-empty.
+    '''
+    _, shm, width, rows = _attach(name, n, width)
+    index = _index
+    buf = shm.buf
+    filled = False
+    for i in range(lo, hi):
+        cell = 0
+        for k in range(i, i + s):
+            p = rows[k - i] + i
+            left = int.from_bytes(buf[p * width:(p + 1) * width], "little")
+            if not left:
+                continue
+            p = rows[i + s - k - 1] + k + 1
+            right = int.from_bytes(buf[p * width:(p + 1) * width], "little")
+            if not right:
+                continue
+            # visit every bit b of left
+            while left:
+                low = left & -left
+                left ^= low
+                entry = index[low.bit_length() - 1]
+                if entry is None or not entry[0] & right:
+                    continue
+                for c_bit, heads in entry[1]:
+                    if right & c_bit:
+                        cell |= heads
+        if cell:
+            p = rows[s] + i
+            buf[p * width:(p + 1) * width] = cell.to_bytes(width, "little")
+            filled = True
+    return filled
+
+
+class ChartPool:
+    '''
+    a pool of `workers` processes, by default one per core, filling charts over the rules `index`
+    (see `mincfg.index_rules_bitset`); the processes are started once, and kept for every chart until `close`.
+    '''
+
+    def __init__(self, index, workers=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        # number of bytes of the shared chart of the last fill
+        self.chart_bytes = 0
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(index,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def chart(self, x, ids, counters=None):
+        '''
+        same as `mincfg.bitset_chart`, but every span diagonal is split among the processes.
+        the cells of a diagonal only depend on shorter spans, so the workers fill them independently into
+        a chart in `multiprocessing.shared_memory`, of every cell a fixed-width little-endian bitset;
+        the diagonals are filled one after the other.
+        '''
+        def read(buf, width, size):
+            return [int.from_bytes(buf[p * width:(p + 1) * width], "little") for p in range(size)]
+        return self._fill_chart(x, ids, counters, read)
+
+    def top(self, x, ids, counters=None):
+        '''
+        same as `chart`, but get only its last cell, that of the whole of `x`, leaving the others in shared memory.
+        '''
+        def read(buf, width, size):
+            return int.from_bytes(buf[(size - 1) * width:size * width], "little")
+        return self._fill_chart(x, ids, counters, read)
+
+    def _fill_chart(self, x, ids, counters, read):
+        n = len(x)
+        width = max(1, (len(ids) + 7) // 8)
+        size = n * (n + 1) // 2
+
+        # a new segment is zero-filled, that is, all cells empty
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size * width))
+        self.chart_bytes = shm.size
+        try:
+            for i in range(n):
+                if x[i] in ids:
+                    shm.buf[i * width:(i + 1) * width] = (1 << ids[x[i]]).to_bytes(width, "little")
+
+            empty_since = None
+            for s in range(1, n):
+                cnt = n - s
+                step = -(-cnt // self.workers)
+                futures = [self.executor.submit(_fill, shm.name, n, width, s, lo, min(cnt, lo + step))
+                           for lo in range(0, cnt, step)]
+                # wait for the whole diagonal before starting the next one
+                filled = any([f.result() for f in futures])
+                if filled:
+                    empty_since = None
+                else:
+                    if empty_since is None:
+                        empty_since = s + 1
+                    if s + 1 < n and stops_chart(s + 1, empty_since):
+                        if counters is not None:
+                            counters["empty_diagonal"] += 1
+                        break
+
+            result = read(shm.buf, width, size)
+        finally:
+            shm.close()
+            shm.unlink()
+        return result
+
+
+def parallel_chart(x, ids, index, workers=None, counters=None):
+    '''
+    same as `mincfg.bitset_chart`, but filled by a `ChartPool` of `workers` processes, started for this chart only;
+    with a single worker, `mincfg.bitset_chart` fills it in this process.
+    `ids` and `index` are the results of `mincfg.intern_symbols` and `mincfg.index_rules_bitset`.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return bitset_chart(None, x, ids, index, counters)
+    with ChartPool(index, workers) as pool:
+        return pool.chart(x, ids, counters)
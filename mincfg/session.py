@@ -0,0 +1,83 @@
+from .mincfg import chart_rows, cyk_cell
+
+
+class MatchSession:
+    '''
+    match a text again after every edit, keeping the CYK chart of `recognizer.grammar_cnf` from the last match.
+    an edit is diffed against the previous symbols: the cells of the substrings within the common prefix or
+    the common suffix are carried over, and only the cells of substrings covering the edit are computed;
+    appending computes only the cells of substrings ending in the appended symbols.
+    `matched` is always what `recognizer.match(text)` would answer, whatever its engine.
+    offsets and lengths are in characters of `text`; in lexing mode, the whole text is lexed again.
+    '''
+
+    def __init__(self, recognizer, text=""):
+        self.recognizer = recognizer
+        self.text = ""
+        self.symbols = []
+        self.chart = []
+        self.matched = recognizer.accepts_empty
+        # number of cells computed by the last edit, rather than carried over
+        self.computed = 0
+        self.set_text(text)
+
+    def insert(self, offset, string):
+        return self.set_text(self.text[:offset] + string + self.text[offset:])
+
+    def delete(self, offset, length):
+        return self.set_text(self.text[:offset] + self.text[offset + length:])
+
+    def replace(self, offset, length, string):
+        return self.set_text(self.text[:offset] + string + self.text[offset + length:])
+
+    def append(self, string):
+        return self.set_text(self.text + string)
+
+    def set_text(self, text):
+        '''
+        replace the whole text by `text`, reusing the cells of the common prefix and suffix; return whether it matches.
+        '''
+        recognizer = self.recognizer
+        x = recognizer.lexer.analyze(text) if recognizer.lexing else list(text)
+        old = self.symbols
+        n0, n1 = len(old), len(x)
+
+        # the common prefix and suffix, not overlapping in either string
+        p = 0
+        while p < min(n0, n1) and old[p] == x[p]:
+            p += 1
+        q = 0
+        while q < min(n0, n1) - p and old[n0 - q - 1] == x[n1 - q - 1]:
+            q += 1
+
+        index = recognizer.rule_index
+        rows0, rows1 = chart_rows(n0), chart_rows(n1)
+        O = self.chart
+        empty = frozenset()
+        N = [empty] * (n1 * (n1 + 1) // 2)
+        for i in range(n1):
+            N[i] = {x[i]}
+        computed = 0
+        for s in range(1, n1):
+            for i in range(n1 - s):
+                if i + s < p:
+                    cell = O[rows0[s] + i]
+                elif i >= n1 - q:
+                    cell = O[rows0[s] + i - (n1 - n0)]
+                else:
+                    cell = cyk_cell(N, rows1, index, i, s)
+                    computed += 1
+                if cell:
+                    N[rows1[s] + i] = cell
+
+        self.text = text
+        self.symbols = x
+        self.chart = N
+        self.computed = computed
+        if n1 == 0:
+            self.matched = recognizer.accepts_empty
+        elif n1 == 1:
+            self.matched = x[0] in recognizer.single_terminals
+        else:
+            self.matched = -1 in N[-1]
+        return self.matched
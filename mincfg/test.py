@@ -1,4 +1,12 @@
 
+import io
+import json
+import os
+import tempfile
+
+from . import bench
+from . import cache
+from . import lexer
 from . import mincfg
 
 
@@ -17,6 +25,59 @@ def test_to_CNF():
     assert((-2, [-1, ')']) in g1)
 
 
+def test_normalization_passes():
+    g1 = [
+        (-1, [-2, -3]),
+        (-2, ['a']),
+        (-2, ['a']),
+        (-2, [-2]),
+        (-3, [-4]),
+        (-4, ['b']),
+        (-4, ['']),
+        (-5, [-4, -4]),
+    ]
+    assert(mincfg.minimize_rules_1(g1) == [
+        (-1, [-2, -3]), (-2, ['a']), (-3, [-4]), (-4, ['b']), (-4, ['']), (-5, [-4, -4])])
+    assert(mincfg.reverse_closure_e(g1) == {-3, -4, -5})
+    assert(mincfg.reverse_closure(g1, 'b') == {-3, -4})
+    assert(mincfg.closure_s(g1, -3) == {-3, -4, 'b', ''})
+    assert(mincfg.closure_s(g1, 'a') == {'a'})
+
+    # <x> is produced by exactly one short rule, and is folded into <a>
+    g2 = [
+        (-1, [-2, -2]),
+        (-2, [-3]),
+        (-3, ['0']),
+        (-3, ['1']),
+    ]
+    assert(mincfg.minimize_rules_3(g2) == [
+        (-1, [-2, -2]), (-2, ['0']), (-2, ['1'])])
+    # the starting -1 is never eliminated
+    g3 = [
+        (-2, [-1]),
+        (-1, ['0']),
+    ]
+    assert(mincfg.minimize_rules_3(g3) == g3)
+
+
+def test_profile_cnf():
+    g = [
+        (-1, [-2, '+', -2, '+', -2]),
+        (-2, ['a']),
+        (-2, ['b'])
+    ]
+    assert(mincfg.long_rule_origins(g) == {-3: -1, -4: -1, -5: -1})
+
+    G_cnf, passes, sources = mincfg.profile_cnf(g)
+    assert(G_cnf == mincfg.to_cnf(g))
+    assert([p["pass"] for p in passes] ==
+           ["input"] + [f.__name__ for f in mincfg.CNF_PASSES])
+    assert(passes[0]["rules"] == 3 and passes[0]["non_terminals"] == 2)
+    assert(passes[-1]["rules"] == len(G_cnf))
+    # all CNF rules come from the long rule of -1
+    assert(sources == [(-1, len(G_cnf))])
+
+
 def test_decide():
     # balanced parenthesis in CNF
     g1 = [
@@ -34,6 +95,557 @@ def test_decide():
     assert(mincfg.decide(g1, "())") == False)
 
 
+def test_index_rules():
+    g1 = [
+        (-1, [-1, -1]),
+        (-1, ['(', -2]),
+        (-1, ['(', ')']),
+        (-2, [-1, ')']),
+        (-3, [-1, ')']),
+    ]
+    index = mincfg.index_rules(g1)
+
+    assert(index[-1][-1] == {-1})
+    assert(index['('] == {-2: {-1}, ')': {-1}})
+    assert(index[-1][')'] == {-2, -3})
+    assert(mincfg.decide(g1, "(())", index) == True)
+    assert(mincfg.decide(g1, "(()", index) == False)
+
+
+def test_decide_bitset():
+    g1 = [
+        (-1, [-1, -1]),
+        (-1, ['(', -2]),
+        (-1, ['(', ')']),
+        (-2, [-1, ')'])
+    ]
+    ids = mincfg.intern_symbols(g1)
+
+    assert(ids[-1] == 0)
+    assert(sorted(ids.values()) == list(range(4)))
+    assert(mincfg.decide_bitset(g1, "(())()") == True)
+    assert(mincfg.decide_bitset(g1, "()(") == False)
+    assert(mincfg.decide_bitset(g1, "(x)") == False)
+
+
+def test_parallel_chart():
+    from mincfg import parallel
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False, "parallel")
+    G = g.grammar_cnf
+    with parallel.ChartPool(g.bitset_index, 2) as pool:
+        for x in ["(()())", "(()", "()(())((", "))"]:
+            expected = mincfg.bitset_chart(G, x, g.symbol_ids, g.bitset_index)
+            assert(parallel.parallel_chart(x, g.symbol_ids, g.bitset_index, workers=2) == expected)
+            assert(pool.chart(x, g.symbol_ids) == expected)
+            assert(pool.top(x, g.symbol_ids) == expected[-1])
+
+    assert(parallel.parallel_chart("(()", g.symbol_ids, g.bitset_index, workers=1) ==
+           mincfg.bitset_chart(G, "(()", g.symbol_ids, g.bitset_index))
+
+    g.workers = 2
+    x = "()" * (parallel.MIN_LENGTH // 2)
+    assert(g.match(x) == True)
+    pool = g._pool
+    assert(pool is not None)
+    # the pool is kept for the next match
+    assert(g.match("(" + x) == False)
+    assert(g._pool is pool)
+    # a single worker fills the chart in this process
+    g.workers = 1
+    assert(g.match(x) == True)
+    assert(g._pool is pool)
+    g.close()
+    assert(g._pool is None)
+
+    # a recognizer evicted from a cache is closed
+    c = mincfg.RecognizerCache(1)
+    with c.get("<S> ::= <S> <S> | '(' <S> ')' | ''", engine="parallel") as g:
+        g._pool = parallel.ChartPool(g.bitset_index, 2)
+        c.get("<S> ::= 'b'")
+        assert(g._pool is None)
+
+
+def test_codegen():
+    from mincfg import codegen
+    g1 = [
+        (-1, [-1, -1]),
+        (-1, ['(', -2]),
+        (-1, ['(', ')']),
+        (-2, [-1, ')'])
+    ]
+    ids = mincfg.intern_symbols(g1)
+    fill = codegen.load_fill(codegen.compile_source(codegen.generate_source(g1, ids)))
+    for x in ["(())()", "()(", "(x)", ""]:
+        assert(codegen.codegen_chart(x, ids, fill) == mincfg.bitset_chart(g1, x, ids))
+    # the same early stop as bitset_chart
+    counters, expected = {"empty_diagonal": 0}, {"empty_diagonal": 0}
+    x = ")" * 10 + "()"
+    assert(codegen.codegen_chart(x, ids, fill, counters) == mincfg.bitset_chart(g1, x, ids, counters=expected))
+    assert(counters == expected == {"empty_diagonal": 1})
+
+    BNF = "<S> ::= <S> <S> | '(' <S> ')' | ''"
+    with tempfile.TemporaryDirectory() as directory:
+        c = cache.GrammarCache(directory)
+        g2 = mincfg.CFLRecognizer(BNF, False, "codegen", cache=c)
+        assert(os.path.exists(c.code_path(BNF, False)))
+        g3 = mincfg.CFLRecognizer(BNF, False, "codegen", cache=c)
+        assert(g3._code is not None)
+        assert(g3.match("(()())") == True)
+        assert(g3.match("(()") == False)
+        assert(list(g2.match_many(["()", "(", "(())"], workers=2)) == [True, False, True])
+
+
+def test_batch():
+    from . import __main__ as cli
+    data = b"()\n(()\r\n\n(())()"
+    records = [b"()", b"(()", b"", b"(())()"]
+    assert(list(cli.read_records(io.BytesIO(data), chunk_size=3)) == records)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "records")
+        with open(path, 'wb') as fd:
+            fd.write(data)
+        assert(list(cli.map_records(path)) == records)
+        open(path, 'wb').close()
+        assert(list(cli.map_records(path)) == [])
+
+    g1 = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    for workers in [1, 2]:
+        out = io.StringIO()
+        summary = cli.run_batch(g1, [b"()", b"(()", b"", b")("], out, workers, chunksize=1)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert([line["match"] for line in lines[:-1]] == [True, False, True, False])
+        assert(lines[-1]["summary"] == summary)
+        assert(summary["records"] == 4 and summary["rejected"] == 2 and summary["errors"] == 0)
+    assert(summary.get("early_rejected") is None)
+    assert(cli.run_batch(g1, [b")("], io.StringIO())["early_rejected"]["first"] == 1)
+
+    # a record that is not UTF-8 or cannot be lexed is an error, and the others still run
+    g2 = mincfg.CFLRecognizer("<S> ::= 'int' 'x'", True)
+    for workers in [1, 2]:
+        out = io.StringIO()
+        summary = cli.run_batch(g2, [b"\xff", b"int x", b"foo", b"\xfe", b"\xfd", b"int x", b"\xff"],
+                                out, workers, chunksize=1)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()][:-1]
+        assert([line["record"] for line in lines] == [1, 2, 3, 4, 5, 6, 7])
+        assert([line["match"] for line in lines] == [False, True, False, False, False, True, False])
+        assert(["error" in line for line in lines] == [True, False, True, True, True, False, True])
+        assert(summary["records"] == 7 and summary["rejected"] == 5 and summary["errors"] == 5)
+
+
+def test_chart_layout():
+    g1 = [
+        (-1, [-1, -1]),
+        (-1, ['(', -2]),
+        (-1, ['(', ')']),
+        (-2, [-1, ')'])
+    ]
+    rows = mincfg.chart_rows(4)
+    N = mincfg.cyk_chart(g1, "(())")
+
+    assert(rows == [0, 4, 7, 9])
+    assert(len(N) == 10)
+    assert(N[rows[0] + 2] == {')'})
+    assert(N[rows[1] + 1] == {-1})
+    assert(N[rows[2] + 0] == set())
+    assert(N[rows[2] + 1] == {-2})
+    assert(N[rows[3] + 0] == {-1})
+
+    g2 = mincfg.compile("<S> ::= <S> <S> | '(' <S> ')' | ''")
+    assert(g2.match("(()())") == True)
+    assert(g2.chart_bytes > 0)
+
+
+def test_earley():
+    g = mincfg.compile("""
+        <S> ::= <S> <S>
+        <S> ::= '(' <S> ')'
+        <S> ::= ''
+    """, engine="earley")
+
+    assert(g.match("") == True)
+    assert(g.match("(") == False)
+    assert(g.match("()") == True)
+    assert(g.match("(()())()") == True)
+    assert(g.match("(()") == False)
+    assert(g.match("())(") == False)
+    # never converted into CNF
+    assert(g._grammar_cnf is None)
+
+    # right recursion takes the completions of Leo's transitive items, and stays linear
+    g = mincfg.CFLRecognizer("<S> ::= 'a' <S> | 'a'", False, "earley")
+    assert(g.match("a" * 5000) == True)
+    assert(g.match("a" * 5000 + "b") == False)
+    g = mincfg.CFLRecognizer("<S> ::= 'a' <S> | 'a' <S> 'b' | ''", False, "earley")
+    g_cnf = mincfg.CFLRecognizer("<S> ::= 'a' <S> | 'a' <S> 'b' | ''", False)
+    for x in ["", "a", "ab", "aab", "abb", "aabb", "aaabb", "abab", "ba"]:
+        assert(g.match(x) == g_cnf.match(x))
+    # a chain through the complete starting -1 from the first column still accepts
+    for bnf, x in [("""
+        <S> ::= <B> <C> | 'b' 'a' 'a'
+        <A> ::= '' | 'b' | <S>
+        <B> ::= <A> | 'a'
+        <C> ::= 'b' 'b' 'b'
+    """, "abbb"), ("""
+        <S> ::= <X> 'c' | 'a' <T>
+        <X> ::= <S>
+        <T> ::= 'a' <T> | 'b'
+    """, "ab"), ("""
+        <S> ::= <A> <T>
+        <A> ::= '' | <S>
+        <T> ::= 'c'
+    """, "ccc")]:
+        assert(mincfg.CFLRecognizer(bnf, False, "earley").match(x) == True)
+
+
+def test_forest():
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    f = g.forest("(()())")
+    pair = (-1, ['(', ')'])
+    assert(list(f.trees()) == [(-1, ['(', (-1, [pair, pair]), ')'])])
+
+    f = g.forest("()()()")
+    assert(f.count() == 2)
+    assert(sorted(map(str, f.trees())) == sorted(map(str, [
+        (-1, [(-1, [pair, pair]), pair]),
+        (-1, [pair, (-1, [pair, pair])])
+    ])))
+
+    # the trees are as many as the binary bracketings, but the forest stays small
+    f = g.forest("()" * 12)
+    assert(f.count() == 58786)
+    assert(len(f) < 100)
+    assert(next(f.trees())[0] == -1)
+
+    # trees deeper than the recursion limit
+    x = "(" * 200 + ")" * 200
+    leaves = []
+    stack = [next(g.forest(x).trees())]
+    while stack:
+        node = stack.pop()
+        if type(node) is str:
+            leaves.append(node)
+        else:
+            stack.extend(reversed(node[1]))
+    assert("".join(leaves) == x)
+
+    assert(g.forest("(()") is None)
+    assert(list(g.forest("").trees()) == [(-1, [])])
+
+
+def test_generate():
+    import random
+    from mincfg import generate
+
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    # (()) and ()() have one derivation tree each
+    assert(g.generator.count(4) == 2)
+    assert(g.generator.count(3) == 0)
+    rng = random.Random(0)
+    assert(g.generate(3, rng) is None)
+    assert(g.generate(0, rng) == "")
+    for n in (2, 8, 30):
+        x = g.generate(n, rng)
+        assert(len(x) == n and g.match(x) == True)
+        y = g.generate(n, rng, near_miss=True)
+        assert(g.match(y) == False)
+
+    seen = {g.generate(4, rng) for _ in range(100)}
+    assert(seen == {"(())", "()()"})
+
+    g2 = mincfg.CFLRecognizer("<S> ::= 'int' <S> | 'x'", True)
+    assert(g2.generate(3, rng) == "int int x")
+
+    x = generate.mutate(list("abc"), ["z"], rng)
+    assert(x != list("abc") and abs(len(x) - 3) <= 1)
+
+
+def test_grammar_cache():
+    BNF = "<S> ::= <S> <S> | '(' <S> ')' | ''"
+    with tempfile.TemporaryDirectory() as directory:
+        c = cache.GrammarCache(directory)
+        assert(c.load(BNF, False) is None)
+
+        g1 = mincfg.compile(BNF, cache=c)
+        assert(os.path.exists(c.path(BNF, False)))
+        assert(c.load(BNF, True) is None)
+
+        g2 = mincfg.compile(BNF, cache=c)
+        assert(g2.grammar == g1.grammar)
+        assert(g2.grammar_cnf == g1.grammar_cnf)
+        assert(g2.match("(())()") == True)
+        assert(g2.match("(()") == False)
+
+        # a damaged entry is dropped
+        with open(c.path(BNF, False), 'wb') as fd:
+            fd.write(b"garbage")
+        assert(c.load(BNF, False) is None)
+        assert(not os.path.exists(c.path(BNF, False)))
+
+        mincfg.compile(BNF, cache=c)
+        assert(c.invalidate(BNF, False) == True)
+        assert(c.invalidate(BNF, False) == False)
+        mincfg.compile(BNF, cache=c)
+        mincfg.compile(BNF, True, cache=c)
+        assert(c.clear() == 2)
+
+        # a recognizer compiled earlier without the cache is stored on the next compile with it
+        mincfg.compile(BNF, engine="codegen")
+        mincfg.compile(BNF, engine="codegen", cache=c)
+        assert(os.path.exists(c.path(BNF, False)))
+        assert(os.path.exists(c.code_path(BNF, False)))
+
+
+def test_binary():
+    from mincfg import binary
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "g.bin")
+        g1 = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+        g1.save(path)
+        compiled = binary.load(path)
+        assert(compiled.lexing == False and compiled.accepts_empty == True)
+        rules = compiled.rules()
+        assert(sorted(map(str, rules)) == sorted(map(str, g1.grammar_cnf)))
+        # sorted by right-hand side
+        symbols = compiled.symbols()
+        keys = [(symbols.index(b), symbols.index(c)) for _, (b, c) in rules]
+        assert(keys == sorted(keys))
+
+        for engine in ("cyk", "bitset", "earley"):
+            g2 = mincfg.CFLRecognizer.load(path, engine)
+            for x in ["", "()", "(()())", "(()", ")"]:
+                assert(g2.match(x) == g1.match(x))
+
+        g3 = mincfg.CFLRecognizer("<S> ::= 'int' <S> | 'x' | 'int'", True)
+        g3.save(path)
+        g4 = mincfg.CFLRecognizer.load(path)
+        assert(g4.lexing == True)
+        assert(g4.single_terminals == {'x', 'int'})
+        assert(g4.match("int int x") == True)
+        assert(g4.match("int") == True)
+
+        with open(path, 'wb') as fd:
+            fd.write(b"MINCFGB\0" + bytes(40))
+        try:
+            binary.load(path)
+            assert(False)
+        except ValueError:
+            pass
+
+
+def test_match_short_strings():
+    g1 = mincfg.compile("""
+        <S> ::= <A> <B> | 'x'
+        <A> ::= 'a' | ''
+        <B> ::= <C>
+        <C> ::= 'b' | ''
+    """)
+    assert(g1.accepts_empty == True)
+    assert(g1.single_terminals == {'a', 'b', 'x'})
+    assert(g1.match("") == True)
+    assert(g1.match("b") == True)
+    assert(g1.match("c") == False)
+    assert(g1.match("ab") == True)
+
+    g2 = mincfg.compile("<S> ::= <S> 'a' | 'b'")
+    assert(g2.accepts_empty == False)
+    assert(g2.single_terminals == {'b'})
+
+    g3 = mincfg.compile("""
+        <S> ::= "apple" | "banana" <S>
+    """, True)
+    assert(g3.match("apple") == True)
+    assert(g3.match("  apple ") == True)
+    assert(g3.match("banana") == False)
+    assert(g3.match("   ") == False)
+
+    for engine in engines():
+        g4 = mincfg.CFLRecognizer("<S> ::= 'hello' | 'a' 'b'", True, engine)
+        assert(g4.match("hello") == True)
+        assert(g4.match("a b") == True)
+        assert(g4.match("hello a") == False)
+
+    assert(mincfg.decide(g2.grammar_cnf, "") == False)
+    assert(mincfg.decide(g2.grammar_cnf, "b") == False)
+
+
+def test_shortcuts():
+    g1 = [
+        (-1, ['a', -2]),
+        (-2, [-1, 'b']),
+        (-1, ['a', 'b']),
+        (-3, ['b', 'c'])
+    ]
+    first, last, follow = mincfg.terminal_bounds(g1)
+    assert(first == {'a'})
+    assert(last == {'b'})
+    assert(follow == {'a': {'a', 'b'}, 'b': {'b'}})
+
+    # no substring of length 2 is derived, so no longer one can be
+    counters = {"empty_diagonal": 0}
+    N = mincfg.cyk_chart(g1, "aaaa", counters=counters)
+    assert(counters["empty_diagonal"] == 1)
+    assert(N[-1] == set())
+
+    g2 = mincfg.CFLRecognizer("<S> ::= 'a' <S> 'b' | 'a' 'b'", False)
+    assert(g2.match("bab") == False)
+    assert(g2.match("aba") == False)
+    assert(g2.match("abab") == False)
+    assert(g2.match("aabb") == True)
+    assert(g2.shortcuts == {"first": 1, "last": 1,
+                            "follow": 1, "empty_diagonal": 0})
+
+
+def test_match_stats():
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    stats = g.match("(()())", stats=True)
+    assert(stats.matched == True and bool(stats) == True)
+    assert(stats.length == 6)
+    assert(stats.shortcut is None)
+    # every substring of two symbols or more is visited, with all its splits
+    assert(stats.cells == 15)
+    assert(stats.splits == 35)
+    assert(stats.probes > 0 and stats.derivations > 0)
+    assert(stats.peak_cell == 1)
+
+    stats = g.match("(()", stats=True)
+    assert(bool(stats) == False)
+    stats = g.match("(((", stats=True)
+    assert(stats.shortcut == "last" and stats.cells is None)
+
+    seen = []
+    g.stats_callback = seen.append
+    assert(g.match("()") == True)
+    assert(len(seen) == 1 and seen[0].matched == True)
+
+
+def test_recognizer_cache():
+    c = mincfg.RecognizerCache(2)
+    g1 = c.get("<S> ::= 'a' <S> | 'a'")
+    assert(c.get("<S> ::= 'a' <S> | 'a'") is g1)
+    assert(c.get("<S> ::= 'a' <S> | 'a'", True) is not g1)
+    assert(c.info() == {"hits": 1, "misses": 2,
+                        "evictions": 0, "size": 2, "maxsize": 2})
+
+    # g1 was used last, so the lexing one goes first
+    c.get("<S> ::= 'a' <S> | 'a'")
+    c.get("<S> ::= 'b'")
+    assert(c.info()["evictions"] == 1)
+    assert(c.get("<S> ::= 'a' <S> | 'a'") is g1)
+
+    c.resize(0)
+    assert(c.info()["size"] == 0)
+    assert(c.get("<S> ::= 'b'").match("b") == True)
+    assert(c.info()["size"] == 0)
+    c.reset_stats()
+    assert(c.info()["hits"] == c.info()["misses"] == c.info()["evictions"] == 0)
+
+    mincfg.recognizer_cache.clear()
+    assert(mincfg.match("<S> ::= 'a' <S> | 'a'", "aaa") == True)
+    assert(mincfg.compile("<S> ::= 'a' <S> | 'a'") is mincfg.compile(
+        "<S> ::= 'a' <S> | 'a'"))
+
+
+def engines():
+    '''
+    get the engines that can run here; "numpy" and "valiant" need NumPy installed.
+    '''
+    try:
+        import numpy
+        return mincfg.ENGINES
+    except ImportError:
+        return tuple(e for e in mincfg.ENGINES if e not in ("numpy", "valiant"))
+
+
+def test_finditer():
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    text = "x(())y()()z)("
+    assert(list(g.finditer(text)) == [(1, 5), (6, 10)])
+    assert(list(g.finditer(text, max_length=2)) == [(2, 4), (6, 8), (8, 10)])
+    # every substring that matches, as found by match
+    expected = [(i, j) for i in range(len(text)) for j in range(i + 1, len(text) + 1)
+                if g.match(text[i:j])]
+    assert(list(g.finditer(text, overlapping=True)) == expected)
+
+    g2 = mincfg.CFLRecognizer("""
+        <S> ::= <A> <A>
+        <A> ::= <X>
+        <X> ::= 'a' | 'b'
+    """, False)
+    assert(list(g2.finditer("xaab", -2)) == [(1, 2), (2, 3), (3, 4)])
+    # <X> is folded into <A> by minimize_rules_3, and searched without that pass
+    assert(list(g2.finditer("xaab", -3)) == [(1, 2), (2, 3), (3, 4)])
+    assert(list(g2.finditer("xaab", -1)) == [(1, 3)])
+    try:
+        list(g2.finditer("xaab", -9))
+        assert(False)
+    except Exception as e:
+        assert("-9" in str(e))
+    # nothing but '' is never found
+    assert(list(mincfg.CFLRecognizer("<S> ::= ''", False).finditer("ab")) == [])
+    g4 = mincfg.CFLRecognizer("<S> ::= <E> 'a' | <E> <E>\n<E> ::= ''", False)
+    assert(list(g4.finditer("bab", -2)) == [])
+    assert(list(g4.finditer("bab")) == [(1, 2)])
+
+    g3 = mincfg.CFLRecognizer("<S> ::= 'int' <S> | 'x'", True)
+    text = "x int  int x x"
+    assert([text[i:j] for i, j in g3.finditer(text)] == ["x", "int  int x", "x"])
+    # the characters that start no token split the text
+    text = "log: int x done; ?int int x!x"
+    assert([text[i:j] for i, j in g3.finditer(text)] == ["int x", "int int x", "x"])
+    assert(list(g3.finditer("log: ?!")) == [])
+
+
+def test_match_session():
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    session = g.session("()" * 10)
+    assert(session.matched == True)
+
+    # only the substrings ending in the two new symbols: 20 + 21 of them
+    assert(session.append("()") == True)
+    assert(session.computed == 41)
+    assert(session.insert(4, "(") == False)
+    assert(session.insert(9, ")") == True)
+    assert(session.text == "()()(()())()()()()()()()")
+    assert(session.delete(0, 2) == True)
+    assert(session.replace(0, 2, ")(") == False)
+    assert(session.set_text("") == True)
+
+    for text in ["(()", "(()())", ")()(", "()(())"]:
+        assert(session.set_text(text) == g.match(text))
+        assert(session.chart == mincfg.cyk_chart(g.grammar_cnf, text))
+
+
+def test_match_many():
+    g = mincfg.CFLRecognizer("<S> ::= <S> <S> | '(' <S> ')' | ''", False)
+    strings = ["(()())", "(()", "", ")(", "()"] * 20
+    expected = [g.match(x) for x in strings]
+    assert(list(g.match_many(strings, workers=1)) == expected)
+    assert(list(g.match_many(iter(strings), workers=2, chunksize=3)) == expected)
+    assert(list(g.match_many([], workers=2)) == [])
+
+
+def test_engines_agree():
+    with open("examples/arithmetic.bnf") as F:
+        arithmetic = F.read()
+    with open("examples/c99.bnf") as F:
+        c99 = F.read()
+    cases = [
+        ("<S> ::= <S> <S> | '(' <S> ')' | '[' <S> ']' | ''", False,
+         ["()", "()[]", "([])[]", "(][)", "([)(])", "(("]),
+        (arithmetic, False,
+         ["(1)", "1+1", "1 + 2 * (3 - 4) / -2", "1++1",
+          "+ 3", "1 (+) 1", "(1 + 3 * 5", "4 * (13 - 2)) / 5"]),
+        (c99, True,
+         ["int main(){return 0;}", "int main({return 0;}",
+          "struct id0{int id1; double id2; char id3[4];};"]),
+    ]
+    for cfgex, lexing, strings in cases:
+        expected = [mincfg.compile(cfgex, lexing).match(x) for x in strings]
+        for engine in engines():
+            g = mincfg.compile(cfgex, lexing, engine)
+            assert([g.match(x) for x in strings] == expected)
+
+
 def test_match_balanced_parenthesis():
     # balanced parenthesis, square brackets & curly brackets
     g1 = mincfg.compile("""
@@ -162,6 +774,69 @@ def test_match_simple_English():
     assert(g4.match("I feel sad.") == False)
 
 
+def test_lexer():
+    lx = lexer.Lexer(["+", "++", "+=", "int", "in", "id"])
+
+    assert(lx.analyze("int+=in++ +") == ["int", "+=", "in", "++", "+"])
+    assert(lx.analyze(" id\n\tin ") == ["id", "in"])
+    assert(lx.analyze("") == [])
+    try:
+        lx.analyze("int i")
+        assert(False)
+    except lexer.ParsingException as e:
+        assert("^" in str(e))
+
+    x = "int+=in++ + id in int"
+    for chunk_size in range(1, 6):
+        chunks = [x[i:i + chunk_size] for i in range(0, len(x), chunk_size)]
+        assert(list(lx.stream(chunks)) == lx.analyze(x))
+        assert(list(lx.stream(io.StringIO(x), chunk_size)) == lx.analyze(x))
+
+    G = [(-1, ["int", -2]), (-2, ["id", ""])]
+    assert(lexer.terminals(G) == {"int", "id"})
+    assert(lexer.lex(G, "int id") == ["int", "id"])
+
+
+def test_match_stream():
+    g1 = mincfg.compile("<S> ::= <S> <S> | '(' <S> ')' | ''")
+    assert(g1.match_stream(io.StringIO("(()())()"), 3) == True)
+    assert(g1.match_stream(io.StringIO("")) == True)
+    assert(g1.match_stream(["(()", "(", "))"]) == True)
+    assert(g1.match_stream(["(()", "(", ")"]) == False)
+
+    # rejected at the first ')', without reading on
+    def chunks():
+        yield ")"
+        raise Exception("read past the rejection")
+    assert(g1.match_stream(chunks()) == False)
+
+    # streamed through Earley whatever the engine, with the same answers as match
+    g3 = mincfg.CFLRecognizer("""
+        <S> ::= <B> <C> | 'b' 'a' 'a'
+        <A> ::= '' | 'b' | <S>
+        <B> ::= <A> | 'a'
+        <C> ::= 'b' 'b' 'b'
+    """, False)
+    for x in ["abbb", "bbbb", "baa", "bbb", "abb"]:
+        assert(g3.match_stream([x]) == g3.match(x))
+    assert(g3.match_stream(["ab", "bb"]) == True)
+
+    with open("examples/c99.bnf") as F:
+        g2 = mincfg.compile(F.read(), True)
+    x = "int main(int id1, char** id2){return 0;}"
+    assert(g2.match_stream(io.StringIO(x), 4) == True)
+    assert(g2.match_stream(io.StringIO(x[:-1]), 4) == False)
+
+
+def test_bench_suite():
+    report = bench.run_suite(lengths=(16, 40), repeat=1)
+    assert(list(report["grammars"]) == list(bench.SUITE))
+    for entry in report["grammars"].values():
+        assert(len(entry["matches"]) == 2)
+        assert(all(m["matched"] for m in entry["matches"]))
+    assert(bench.compare(report, report) == 0)
+
+
 def test_BNF_lexing():
     BNF = """
         <S> ::= "" | <A> <S> <B>
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def valiant_chart(x, ids, table):
+    '''
+    recognize string `x` by a CFG in CNF with Valiant's reduction to boolean matrix multiplication,
+    in the divide-and-conquer formulation of Okhotin (2014), "Parsing by matrix multiplication generalized to Boolean grammars".
+    `ids` and `table` are the results of `mincfg.intern_symbols` and `vectorized.rule_table`.
+    the chart is a boolean array T, where T[A, i, j] tells whether symbol A can derive substring x[i:j];
+    its side is padded to a power of two, and all products are batched float32 matrix multiplications.
+    '''
+    n = len(x)
+    lefts, rights, heads, offsets = table
+
+    size = 4
+    while size < n + 1:
+        size *= 2
+    T = np.zeros((len(ids), size, size), dtype=bool)
+    for i, t in enumerate(x):
+        if t in ids:
+            T[ids[t], i, i + 1] = True
+    if len(heads) == 0:
+        return T
+
+    # P[h, i, j] tells whether x[i:j] splits into B C for some rule heads[h] -> B C
+    P = np.zeros((len(heads), size, size), dtype=bool)
+    # rule_heads[r] is the position in heads of the head of rule r
+    rule_heads = np.repeat(np.arange(len(heads)), np.diff(np.append(offsets, len(lefts))))
+
+    def multiply(rows, mids, cols):
+        '''
+        P[rows, cols] |= T[rows, mids] x T[mids, cols], for every rule.
+        '''
+        if mids[0] == mids[1] or cols[0] > n:
+            return
+        left = T[:, rows[0]:rows[1], mids[0]:mids[1]]
+        right = T[:, mids[0]:mids[1], cols[0]:cols[1]]
+        active = left.any(axis=(1, 2))[lefts] & right.any(axis=(1, 2))[rights]
+        if not active.any():
+            return
+        product = np.matmul(left[lefts[active]].astype(np.float32),
+                            right[rights[active]].astype(np.float32)) > 0
+        # the active rules are still grouped by head
+        hs, starts = np.unique(rule_heads[active], return_index=True)
+        P[hs, rows[0]:rows[1], cols[0]:cols[1]] |= np.logical_or.reduceat(product, starts, axis=0)
+
+    def compute(l, m):
+        '''
+        compute T[i, j] for all l <= i < j < m.
+        '''
+        if l > n:
+            # the padding derives nothing
+            return
+        mid = (l + m) // 2
+        if m - l >= 4:
+            compute(l, mid)
+            compute(mid, m)
+        complete((l, mid), (mid, m))
+
+    def complete(rows, cols):
+        '''
+        compute T[rows, cols], given T within rows, T within cols, and
+        P[rows, cols] already holding every split point strictly between rows and cols.
+        '''
+        (l, m), (l2, m2) = rows, cols
+        if l2 > n:
+            # the padding derives nothing
+            return
+        if m - l == 1:
+            if m < l2:
+                T[heads, l, l2] |= P[:, l, l2]
+            # otherwise the cell is of a single symbol, set from x
+            return
+        B, C = (l, (l + m) // 2), ((l + m) // 2, m)
+        D, E = (l2, (l2 + m2) // 2), ((l2 + m2) // 2, m2)
+        multiply(C, (m, l2), D)
+        complete(C, D)
+        multiply(B, C, D)
+        complete(B, D)
+        multiply(C, D, E)
+        complete(C, E)
+        multiply(B, (m, l2), E)
+        multiply(B, C, E)
+        multiply(B, D, E)
+        complete(B, E)
+
+    compute(0, size)
+    return T
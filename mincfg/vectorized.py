@@ -0,0 +1,59 @@
+import numpy as np
+
+
+# upper bound on the number of booleans combined by one batched step
+BATCH_SIZE = 1 << 24
+
+
+def rule_table(G, ids):
+    '''
+    get the rules A -> B C of CFG `G` in CNF over the symbol ids `ids` (see `mincfg.intern_symbols`) as arrays
+    (lefts, rights, heads, offsets):
+        lefts and rights are the ids of B and C of every rule, with the rules grouped by A
+        heads are the distinct ids of A, and offsets[k] is where the rules of heads[k] begin
+    '''
+    rules = sorted((ids[a], ids[b], ids[c]) for a, (b, c) in G)
+    lefts = np.array([b for _, b, _ in rules], dtype=np.intp)
+    rights = np.array([c for _, _, c in rules], dtype=np.intp)
+    heads = []
+    offsets = []
+    for k, (a, _, _) in enumerate(rules):
+        if not heads or heads[-1] != a:
+            heads.append(a)
+            offsets.append(k)
+    return lefts, rights, np.array(heads, dtype=np.intp), np.array(offsets, dtype=np.intp)
+
+
+def numpy_chart(x, ids, table):
+    '''
+    fill the CYK chart of a CFG in CNF on string `x` with all cells of one span length computed in one batch.
+    `ids` and `table` are the results of `mincfg.intern_symbols` and `rule_table`.
+    the chart is a boolean array T, where T[l, A, i] tells whether symbol A can derive substring x[i:i+l];
+    that is, T[:, A, :] is the (start, end) matrix of A stored span-major.
+    '''
+    n = len(x)
+    lefts, rights, heads, offsets = table
+
+    T = np.zeros((n + 1, len(ids), n), dtype=bool)
+    for i, t in enumerate(x):
+        if t in ids:
+            T[1, ids[t], i] = True
+    if len(heads) == 0:
+        return T
+
+    for l in range(2, n + 1):
+        # the substrings of length l start at 0 .. cnt - 1
+        cnt = n - l + 1
+        hits = np.zeros((len(lefts), cnt), dtype=bool)
+        # the first half is of length m, the second half of length l - m;
+        # split the range of m so that one batch stays within BATCH_SIZE
+        step = max(1, BATCH_SIZE // (len(lefts) * cnt))
+        for m0 in range(1, l, step):
+            m = np.arange(m0, min(l, m0 + step))
+            left = T[m[:, None, None], lefts[None, :, None], np.arange(cnt)[None, None, :]]
+            right = T[(l - m)[:, None, None], rights[None, :, None],
+                      (np.arange(cnt)[None, :] + m[:, None])[:, None, :]]
+            hits |= (left & right).any(axis=0)
+        T[l, heads, :cnt] = np.logical_or.reduceat(hits, offsets, axis=0)
+
+    return T